@@ -1,47 +1,655 @@
-import bz2
-
-def compress(input_file, output_file):
-    """
-    Compresses a text file using bzip2.
-
-    Args:
-        input_file (str): Path to the input file.
-        output_file (str): Path to the output compressed file.
-    """
-    try:
-        # Read the input text file
-        with open(input_file, 'rb') as f:
-            data = f.read()
-
-        # Compress the data using bzip2
-        compressed_data = bz2.compress(data)
-
-        # Save the compressed data to the output file
-        with open(output_file, 'wb') as f:
-            f.write(compressed_data)
-
-    except Exception as e:
-        print(f"Compression error: {e}")
-
-def decompress(input_file, output_file):
-    """
-    Decompresses a text file compressed with bzip2.
-
-    Args:
-        input_file (str): Path to the compressed file.
-        output_file (str): Path to save the decompressed file.
-    """
-    try:
-        # Read the compressed data
-        with open(input_file, 'rb') as f:
-            compressed_data = f.read()
-
-        # Decompress the data
-        decompressed_data = bz2.decompress(compressed_data)
-
-        # Save the original data to the output file
-        with open(output_file, 'wb') as f:
-            f.write(decompressed_data)
-
-    except Exception as e:
-        print(f"Decompression error: {e}")
\ No newline at end of file
+import bisect
+import bz2
+import io
+import os
+import re
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from compression.mapped_input import MappedInput
+from compression.parallel import ordered_results
+from huffman.huffman import HuffmanCoding
+
+# Bytes read, and at most written, per step of compress and decompress
+BUFFER_SIZE = 1 << 20
+
+# Start of a bzip2 stream: "BZh", the block size digit, then either the
+# magic of the first block (pi) or, for an empty stream, the end-of-stream
+# magic (sqrt(pi)).  Both are byte aligned at the start of a stream.
+STREAM_HEADER = re.compile(rb'BZh[1-9](?:\x31\x41\x59\x26\x53\x59|\x17\x72\x45\x38\x50\x90)')
+STREAM_HEADER_SIZE = 10
+
+# Largest piece, compressed or decompressed, that decompress hands to a
+# worker: a few of the largest bzip2 blocks.  A bzip2 block can expand far
+# beyond its nominal size, so bigger pieces are decoded sequentially, which
+# keeps memory use bounded.
+PARALLEL_PIECE_SIZE = 4 * 900000
+
+# Block index, kept in a sidecar file next to the archive so the archive
+# stays plain bzip2.  Layout as the Huffman trailer index: for every stream
+# its file offset and uncompressed offset (8 bytes each, big-endian), then
+# one more entry with the archive size and the uncompressed size, then the
+# entry count (8 bytes) and INDEX_MAGIC.
+INDEX_MAGIC = b'BIDX'
+INDEX_SUFFIX = '.idx'
+
+def _compress_stream(block, compresslevel):
+    """Worker: compress one block as a complete bzip2 stream"""
+    return len(block), bz2.compress(block, compresslevel)
+
+def _decompress_stream(data):
+    """
+    Worker: decompress exactly one bzip2 stream, or return None if ``data``
+    is not one or decodes to more than PARALLEL_PIECE_SIZE bytes
+    """
+    decompressor = bz2.BZ2Decompressor()
+    try:
+        decoded = decompressor.decompress(data, max_length=PARALLEL_PIECE_SIZE)
+    except OSError:
+        return None
+    if not decompressor.eof or decompressor.unused_data:
+        return None
+    return decoded
+
+def stream_offsets(input_file, buffer_size=BUFFER_SIZE):
+    """
+    Find the offsets of the bzip2 stream headers in a file.
+
+    The scan matches header bytes only, so an offset inside compressed data
+    that happens to look like a header is possible; callers must verify each
+    stream when they decompress it.
+
+    Args:
+        input_file (str): Path to the compressed file.
+        buffer_size (int): Bytes read per step.
+
+    Returns:
+        list: Candidate stream offsets in ascending order.
+    """
+    offsets = []
+    position = 0
+    tail = b''
+    with open(input_file, 'rb') as f:
+        chunk = f.read(buffer_size)
+        while chunk:
+            # Keep the end of the previous chunk so headers across the boundary
+            # are seen; it is shorter than a header, so none is found twice
+            data = tail + chunk
+            start = position - len(tail)
+            offsets.extend(start + match.start() for match in STREAM_HEADER.finditer(data))
+            position += len(chunk)
+            tail = data[-(STREAM_HEADER_SIZE - 1):]
+            chunk = f.read(buffer_size)
+    return offsets
+
+def write_index(index_file, entries):
+    """
+    Write a block index.
+
+    Args:
+        index_file (str): Path to the index file.
+        entries (list): (file offset, uncompressed offset) of every stream,
+            followed by (archive size, uncompressed size).
+    """
+    with open(index_file, 'wb') as f:
+        for offset, position in entries:
+            f.write(offset.to_bytes(8, byteorder='big'))
+            f.write(position.to_bytes(8, byteorder='big'))
+        f.write(len(entries).to_bytes(8, byteorder='big'))
+        f.write(INDEX_MAGIC)
+
+def read_index(index_file):
+    """
+    Read a block index written by write_index.
+
+    Returns:
+        list: (file offset, uncompressed offset) of every stream followed by
+            (archive size, uncompressed size), or None if the file is
+            missing or is not an index.
+    """
+    if not os.path.exists(index_file):
+        return None
+    with open(index_file, 'rb') as f:
+        data = f.read()
+    if len(data) < 12 or data[-4:] != INDEX_MAGIC:
+        return None
+    count = int.from_bytes(data[-12:-4], byteorder='big')
+    if count < 2 or 16 * count + 12 != len(data):
+        return None
+    return [(int.from_bytes(data[i:i + 8], byteorder='big'), int.from_bytes(data[i + 8:i + 16], byteorder='big'))
+            for i in range(0, 16 * count, 16)]
+
+def read_range(input_file, offset, length, index_file=None):
+    """
+    Decompress only the streams of an indexed archive that cover a byte range.
+
+    Args:
+        input_file (str): Path to an archive written with index=True.
+        offset (int): Uncompressed offset of the first byte to read.
+        length (int): Number of bytes to read; the range is cut at the end
+            of the data.
+        index_file (str): Path to the index; defaults to the archive path
+            followed by INDEX_SUFFIX.
+
+    Returns:
+        bytes: The requested range.
+
+    Raises:
+        ValueError: If the range is negative, or the index is missing or
+            does not belong to the archive.
+    """
+    if offset < 0 or length < 0:
+        raise ValueError(f"Invalid range: offset {offset}, length {length}")
+    index_file = index_file or input_file + INDEX_SUFFIX
+    entries = read_index(index_file)
+    if entries is None:
+        raise ValueError(f"No block index found at {index_file}; compress with index=True")
+    if os.path.getsize(input_file) != entries[-1][0]:
+        raise ValueError(f"Index {index_file} does not match {input_file}")
+    end = min(offset + length, entries[-1][1])
+    if offset >= end:
+        return b''
+    positions = [position for _, position in entries]
+    first = bisect.bisect_right(positions, offset) - 1
+    last = bisect.bisect_left(positions, end)
+    with open(input_file, 'rb') as f:
+        f.seek(entries[first][0])
+        decoded = bz2.decompress(f.read(entries[last][0] - entries[first][0]))
+    if len(decoded) != positions[last] - positions[first]:
+        raise ValueError(f"Index {index_file} does not match {input_file}")
+    return decoded[offset - positions[first]:end - positions[first]]
+
+def compress(input_file, output_file, compresslevel=9, buffer_size=BUFFER_SIZE, progress_callback=None, workers=None,
+             index=False):
+    """
+    Compresses a file using bzip2, streaming it in chunks.
+
+    With several workers every block is compressed as its own bzip2 stream
+    in a process pool and the streams are concatenated, as pbzip2 does; the
+    output is still read by bz2.decompress and bunzip2.  With index=True
+    the output is written the same way and a block index is saved next to
+    it, so read_range can decompress only the streams a range needs.
+
+    Args:
+        input_file (str): Path to the input file.
+        output_file (str): Path to the output compressed file.
+        compresslevel (int): bzip2 block size in units of 100 KB, from 1 to 9.
+        buffer_size (int): Bytes read per step; memory use does not depend
+            on the file size.
+        progress_callback (callable): Called with the number of input bytes
+            processed so far after every step.
+        workers (int): Number of worker processes; None or 1 compresses
+            in this process.
+        index (bool): Write one stream per block and save a block index to
+            output_file followed by INDEX_SUFFIX.
+    """
+    if index or (workers and workers > 1):
+        _compress_streams(input_file, output_file, compresslevel, progress_callback, workers,
+                          output_file + INDEX_SUFFIX if index else None)
+        return
+    compressor = bz2.BZ2Compressor(compresslevel)
+    processed = 0
+    with MappedInput(input_file) as source, open(output_file, 'wb') as output:
+        for chunk in source.chunks(buffer_size):
+            output.write(compressor.compress(chunk))
+            processed += len(chunk)
+            if progress_callback:
+                progress_callback(processed)
+        output.write(compressor.flush())
+
+def _compress_streams(input_file, output_file, compresslevel, progress_callback, workers, index_file):
+    # One stream per bzip2 block, so each worker holds a single block
+    block_size = compresslevel * 100000
+    entries = []
+    position = 0
+    processed = 0
+    with MappedInput(input_file) as source, open(output_file, 'wb') as output, ExitStack() as stack:
+        blocks = ((block, compresslevel) for block in source.chunks(block_size))
+        if workers and workers > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(workers))
+            blocks = ((bytes(block), level) for block, level in blocks)
+            streams = ordered_results(executor, _compress_stream, blocks, 2 * workers)
+        else:
+            streams = (_compress_stream(*args) for args in blocks)
+        for size, compressed in streams:
+            entries.append((position, processed))
+            output.write(compressed)
+            position += len(compressed)
+            processed += size
+            if progress_callback:
+                progress_callback(processed)
+        if not entries:
+            # An empty input still gets a valid, empty stream
+            entries.append((0, 0))
+            empty = bz2.compress(b'', compresslevel)
+            output.write(empty)
+            position = len(empty)
+    if index_file:
+        entries.append((position, processed))
+        write_index(index_file, entries)
+
+def decompress(input_file, output_file, buffer_size=BUFFER_SIZE, progress_callback=None, workers=None):
+    """
+    Decompresses a bzip2 file, streaming it in chunks.
+
+    Files made of several concatenated bzip2 streams, as written by pbzip2,
+    are decompressed in full.  With several workers such files are split at
+    the stream headers and the streams are decompressed in a process pool;
+    every piece must decode to exactly one complete stream of at most
+    PARALLEL_PIECE_SIZE bytes, and from the first piece that does not the
+    rest of the file is decompressed sequentially.
+
+    Args:
+        input_file (str): Path to the compressed file.
+        output_file (str): Path to save the decompressed file.
+        buffer_size (int): Compressed bytes read, and at most decompressed
+            bytes held, per step.
+        progress_callback (callable): Called with the number of compressed
+            bytes processed so far after every step.
+        workers (int): Number of worker processes; None or 1 decompresses
+            in this process.
+
+    Raises:
+        EOFError: If the file ends in the middle of a stream.
+        OSError: If the data is not valid bzip2.
+    """
+    with open(output_file, 'wb') as output:
+        start = 0
+        if workers and workers > 1:
+            offsets = stream_offsets(input_file, buffer_size)
+            if len(offsets) > 1 and offsets[0] == 0:
+                start = _decompress_parallel(input_file, output, offsets, progress_callback, workers)
+        _decompress_sequential(input_file, output, start, buffer_size, progress_callback)
+
+def _decompress_parallel(input_file, output, offsets, progress_callback, workers):
+    # Returns the offset sequential decompression must continue from
+    with open(input_file, 'rb') as f:
+        f.seek(0, io.SEEK_END)
+        bounds = list(zip(offsets, offsets[1:] + [f.tell()]))
+        # Pieces from the first oversized one on are left to the sequential path
+        resume = bounds[-1][1]
+        for i, (start, end) in enumerate(bounds):
+            if end - start > PARALLEL_PIECE_SIZE:
+                bounds, resume = bounds[:i], start
+                break
+
+        def pieces():
+            for start, end in bounds:
+                f.seek(start)
+                yield (f.read(end - start),)
+
+        with ProcessPoolExecutor(workers) as executor:
+            results = ordered_results(executor, _decompress_stream, pieces(), 2 * workers)
+            for (start, end), decoded in zip(bounds, results):
+                if decoded is None:
+                    # A false header split a stream, or the data is damaged
+                    results.close()
+                    return start
+                output.write(decoded)
+                if progress_callback:
+                    progress_callback(end)
+    return resume
+
+def _decompress_sequential(input_file, output, start, buffer_size, progress_callback):
+    decompressor = bz2.BZ2Decompressor()
+    started = False
+    processed = start
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(buffer_size)
+        while chunk:
+            data = chunk
+            started = True
+            while data or not decompressor.needs_input:
+                if decompressor.eof:
+                    # The next stream starts in the bytes after this one
+                    data = decompressor.unused_data + data
+                    decompressor = bz2.BZ2Decompressor()
+                    if not data:
+                        started = False
+                        break
+                output.write(decompressor.decompress(data, max_length=buffer_size))
+                data = b''
+            processed += len(chunk)
+            if progress_callback:
+                progress_callback(processed)
+            chunk = f.read(buffer_size)
+    if started and not decompressor.eof:
+        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+# Native Burrows-Wheeler pipeline: each block is sorted with a suffix array,
+# move-to-front coded, zero runs are RLE coded and the result is Huffman
+# coded.  File layout: NATIVE_MAGIC, then for every block its length and
+# primary index (4 bytes each, big-endian) followed by one Huffman block;
+# a block length of zero ends the file.
+NATIVE_MAGIC = b'BWT\x01'
+
+# Input bytes per block, as bzip2 -9
+BLOCK_SIZE = 900000
+
+SORT_STRATEGIES = ("doubling", "sais")
+
+# Zero runs are written as bijective base-2 digits, as in bzip2
+RUNA = 0
+RUNB = 1
+
+# Move-to-front values from ESCAPE_VALUE up are written as ESCAPE_SYMBOL
+# followed by the offset from ESCAPE_VALUE, so every symbol fits in a byte
+ESCAPE_VALUE = 254
+ESCAPE_SYMBOL = 255
+
+def _suffix_array_doubling(data):
+    # Prefix doubling: sort by the first k bytes, then by pairs of k-byte
+    # ranks, until every rank is unique.  O(n log^2 n) but fully vectorized.
+    n = len(data)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    rank = data.astype(np.int64)
+    k = 1
+    while True:
+        # Rank k bytes on; 0 past the end, so shorter suffixes sort first
+        second = np.zeros(n, dtype=np.int64)
+        second[:n - k] = rank[k:] + 1
+        key = rank * (int(rank.max()) + 2) + second
+        suffix_array = np.argsort(key)
+        sorted_key = key[suffix_array]
+        sorted_rank = np.zeros(n, dtype=np.int64)
+        np.cumsum(sorted_key[1:] != sorted_key[:-1], out=sorted_rank[1:])
+        rank[suffix_array] = sorted_rank
+        if sorted_rank[-1] == n - 1:
+            return suffix_array
+        k *= 2
+
+def _sais(text, alphabet_size):
+    # SA-IS over a list of ints ending with a unique 0 sentinel
+    n = len(text)
+    if n == 1:
+        return [0]
+    values = np.asarray(text, dtype=np.int64)
+    # S-type when smaller than the next suffix; a run of equal values takes
+    # the type decided at the first change after it
+    change = np.flatnonzero(values[:-1] != values[1:])
+    stype = np.ones(n, dtype=bool)
+    stype[:-1] = (values[change] < values[change + 1])[np.searchsorted(change, np.arange(n - 1))]
+    lms_mask = np.zeros(n, dtype=bool)
+    lms_mask[1:] = stype[1:] & ~stype[:-1]
+    lms = np.flatnonzero(lms_mask).tolist()
+
+    counts = np.bincount(values, minlength=alphabet_size)
+    ends = np.cumsum(counts).tolist()
+    starts = (np.cumsum(counts) - counts).tolist()
+    is_s = stype.tolist()
+    is_lms = lms_mask.tolist()
+
+    def induce(order):
+        suffix_array = [-1] * n
+        tails = list(ends)
+        for i in reversed(order):
+            tails[text[i]] -= 1
+            suffix_array[tails[text[i]]] = i
+        heads = list(starts)
+        for i in range(n):
+            j = suffix_array[i] - 1
+            if j >= 0 and not is_s[j]:
+                suffix_array[heads[text[j]]] = j
+                heads[text[j]] += 1
+        tails = list(ends)
+        for i in range(n - 1, -1, -1):
+            j = suffix_array[i] - 1
+            if j >= 0 and is_s[j]:
+                tails[text[j]] -= 1
+                suffix_array[tails[text[j]]] = j
+        return suffix_array
+
+    def same_substring(a, b):
+        if a == n - 1 or b == n - 1:
+            return a == b
+        i = 0
+        while True:
+            if text[a + i] != text[b + i] or is_s[a + i] != is_s[b + i]:
+                return False
+            if i > 0 and (is_lms[a + i] or is_lms[b + i]):
+                return is_lms[a + i] and is_lms[b + i]
+            i += 1
+
+    # Sort the LMS substrings, name them, and sort the LMS suffixes through
+    # the reduced string of names when the names are not all different
+    suffix_array = induce(lms)
+    names = [-1] * n
+    name = -1
+    previous = None
+    for position in suffix_array:
+        if is_lms[position]:
+            if previous is None or not same_substring(previous, position):
+                name += 1
+            names[position] = name
+            previous = position
+    reduced = [names[position] for position in lms]
+
+    if name + 1 < len(reduced):
+        reduced_order = _sais(reduced, name + 1)
+    else:
+        reduced_order = [0] * len(reduced)
+        for i, value in enumerate(reduced):
+            reduced_order[value] = i
+    return induce([lms[i] for i in reduced_order])
+
+def suffix_array(data, strategy="doubling"):
+    """
+    Sort the suffixes of a block, a shorter suffix first when it is a prefix of a longer one.
+
+    Args:
+        data (numpy.ndarray): uint8 block.
+        strategy (str): "doubling" for NumPy prefix doubling, or "sais" for
+            linear-time SA-IS. Doubling is usually faster in CPython; SA-IS
+            does not slow down on highly repetitive blocks.
+
+    Returns:
+        numpy.ndarray: Start offsets of the sorted suffixes.
+    """
+    if strategy == "doubling":
+        return _suffix_array_doubling(data)
+    if strategy == "sais":
+        # Shift bytes up by one to make room for the sentinel
+        text = (data.astype(np.int64) + 1).tolist() + [0]
+        return np.asarray(_sais(text, 257)[1:], dtype=np.int64)
+    raise ValueError(f"Unknown sort strategy: {strategy}")
+
+def bwt_encode(data, strategy="doubling"):
+    """
+    Burrows-Wheeler transform of a block with an implicit end-of-block marker.
+
+    Returns:
+        tuple: (last column as a uint8 array without the marker, row of the marker)
+    """
+    if len(data) == 0:
+        return data, 0
+    rows = np.concatenate(([len(data)], suffix_array(data, strategy)))
+    primary = int(np.flatnonzero(rows == 0)[0])
+    return np.delete(data[rows - 1], primary), primary
+
+def bwt_decode(last_column, primary):
+    """Invert bwt_encode"""
+    n = len(last_column)
+    if not 0 <= primary <= n:
+        raise ValueError("Invalid Burrows-Wheeler primary index")
+    # The marker sorts before every byte
+    column = np.insert(last_column.astype(np.int16), primary, -1)
+    # LF mapping: row of the rotation that starts with each row's last byte
+    lf = np.empty(n + 1, dtype=np.int64)
+    lf[np.argsort(column, kind='stable')] = np.arange(n + 1)
+
+    # Following LF from any row walks the text backwards and reaches the
+    # marker row after as many steps as the row's suffix offset.  Those
+    # distances are found by pointer jumping instead of a walk per byte.
+    following = lf
+    following[primary] = primary
+    offsets = np.ones(n + 1, dtype=np.int64)
+    offsets[primary] = 0
+    steps = 1
+    while steps <= n:
+        offsets += offsets[following]
+        following = following[following]
+        steps *= 2
+    # Rows on a cycle that misses the marker count past n
+    if offsets.max() != n:
+        raise ValueError("Corrupt Burrows-Wheeler block")
+    # Each row's last byte precedes its suffix in the text
+    output = np.empty(n, dtype=np.uint8)
+    rows = offsets > 0
+    output[offsets[rows] - 1] = column[rows]
+    return output
+
+def mtf_encode(data):
+    """
+    Move-to-front code a uint8 array.
+
+    After the transform most bytes repeat the one before them and code to 0,
+    so only the first byte of every run goes through the symbol list.
+    """
+    values = np.zeros(len(data), dtype=np.uint8)
+    if len(data) == 0:
+        return values
+    heads = np.flatnonzero(np.r_[True, data[1:] != data[:-1]])
+    order = list(range(256))
+    ranks = []
+    for symbol in data[heads].tolist():
+        rank = order.index(symbol)
+        ranks.append(rank)
+        del order[rank]
+        order.insert(0, symbol)
+    values[heads] = ranks
+    return values
+
+def mtf_decode(values):
+    """Invert mtf_encode"""
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    starts = np.r_[True, values[1:] != 0]
+    order = list(range(256))
+    symbols = []
+    for rank in values[starts].tolist():
+        symbol = order.pop(rank)
+        order.insert(0, symbol)
+        symbols.append(symbol)
+    return np.asarray(symbols, dtype=np.uint8)[np.cumsum(starts) - 1]
+
+def rle_zero_encode(values):
+    """
+    Replace runs of zeros in move-to-front output with RUNA/RUNB digits.
+
+    Non-zero values v are written as v + 1, or as ESCAPE_SYMBOL and an offset
+    when they do not fit, so the result is a uint8 array.
+    """
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=np.uint8)
+    zero = values == 0
+    run_start = zero & ~np.r_[False, zero[:-1]]
+    run_end = zero & ~np.r_[zero[1:], False]
+    run_lengths = np.flatnonzero(run_end) - np.flatnonzero(run_start) + 1
+
+    # One item per non-zero value and per zero run, in order
+    positions = np.flatnonzero(~zero | run_start)
+    is_run = run_start[positions]
+    items = values[positions].astype(np.int64)
+    # A run of m zeros takes floor(log2(m + 1)) digits
+    digits = np.floor(np.log2(run_lengths + 1)).astype(np.int64)
+    sizes = np.where(items >= ESCAPE_VALUE, 2, 1)
+    sizes[is_run] = digits
+    offsets = np.cumsum(sizes) - sizes
+
+    symbols = np.empty(int(sizes.sum()), dtype=np.uint8)
+    literal_offsets = offsets[~is_run]
+    literals = items[~is_run]
+    escaped = literals >= ESCAPE_VALUE
+    symbols[literal_offsets] = np.where(escaped, ESCAPE_SYMBOL, literals + 1)
+    symbols[literal_offsets[escaped] + 1] = literals[escaped] - ESCAPE_VALUE
+    # m + 1 in binary below its leading one, least significant digit first
+    run_offsets = offsets[is_run]
+    for digit in range(int(digits.max(initial=0))):
+        selected = digits > digit
+        symbols[run_offsets[selected] + digit] = ((run_lengths[selected] + 1) >> digit) & 1
+    return symbols
+
+def rle_zero_decode(symbols):
+    """Invert rle_zero_encode"""
+    symbols = symbols.astype(np.int64)
+    escapes = np.flatnonzero(symbols == ESCAPE_SYMBOL)
+    if len(escapes) and (escapes[-1] + 1 >= len(symbols) or (symbols[escapes + 1] > 1).any()):
+        raise ValueError("Corrupt Burrows-Wheeler run-length data")
+    keep = np.ones(len(symbols), dtype=bool)
+    keep[escapes + 1] = False
+    items = symbols - 1
+    items[escapes] = ESCAPE_VALUE + symbols[escapes + 1]
+    is_digit = (symbols <= RUNB)[keep]
+    digit_values = symbols[keep]
+    items = items[keep]
+
+    # Each literal is a group, and so is each run of consecutive digits
+    group_start = ~is_digit | ~np.r_[False, is_digit[:-1]]
+    group = np.cumsum(group_start) - 1
+    starts = np.flatnonzero(group_start)
+    place = np.arange(len(items)) - starts[group]
+    weights = np.where(is_digit, (digit_values + 1) << place, 0)
+    counts = np.bincount(group, weights=weights, minlength=len(starts)).astype(np.int64)
+    head_is_digit = is_digit[starts]
+    counts[~head_is_digit] = 1
+    group_values = np.where(head_is_digit, 0, items[starts])
+    return np.repeat(group_values, counts).astype(np.uint8)
+
+def compress_native(input_file, output_file, block_size=BLOCK_SIZE, sort_strategy="doubling"):
+    """
+    Compresses a file with the in-project Burrows-Wheeler pipeline.
+
+    Args:
+        input_file (str): Path to the input file.
+        output_file (str): Path to the output compressed file.
+        block_size (int): Input bytes transformed at a time; larger blocks
+            compress better but sort slower.
+        sort_strategy (str): Suffix sorting method, one of SORT_STRATEGIES.
+    """
+    if not 0 < block_size < 1 << 32:
+        raise ValueError("block_size must be between 1 and 2**32 - 1")
+    if sort_strategy not in SORT_STRATEGIES:
+        raise ValueError(f"Unknown sort strategy: {sort_strategy}")
+    coder = HuffmanCoding(None)
+    with MappedInput(input_file) as source, open(output_file, 'wb') as output:
+        output.write(NATIVE_MAGIC)
+        for block in source.chunks(block_size):
+            data = np.frombuffer(block, dtype=np.uint8)
+            last_column, primary = bwt_encode(data, sort_strategy)
+            output.write(len(data).to_bytes(4, byteorder='big'))
+            output.write(primary.to_bytes(4, byteorder='big'))
+            coder.encode_block(rle_zero_encode(mtf_encode(last_column)), output)
+        output.write(bytes(4))
+
+def decompress_native(input_file, output_file):
+    """
+    Decompresses a file written by compress_native.
+
+    Args:
+        input_file (str): Path to the compressed file.
+        output_file (str): Path to save the decompressed file.
+    """
+    coder = HuffmanCoding(None)
+    with open(input_file, 'rb') as f, open(output_file, 'wb') as output:
+        if f.read(len(NATIVE_MAGIC)) != NATIVE_MAGIC:
+            raise ValueError("Not a native Burrows-Wheeler compressed file")
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                raise ValueError("Truncated Burrows-Wheeler compressed file")
+            size = int.from_bytes(header, byteorder='big')
+            if size == 0:
+                break
+            primary = int.from_bytes(f.read(4), byteorder='big')
+            symbols = io.BytesIO()
+            if not coder.decode_block(f, symbols):
+                raise ValueError("Truncated Burrows-Wheeler compressed file")
+            values = rle_zero_decode(np.frombuffer(symbols.getvalue(), dtype=np.uint8))
+            if len(values) != size:
+                raise ValueError("Corrupt Burrows-Wheeler block")
+            output.write(bwt_decode(mtf_decode(values), primary).tobytes())
@@ -9,10 +9,11 @@ from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
 
 # Import compression algorithm modules
-from deflate.deflate import compress_file as deflate_compress, decompress_file as deflate_decompress
+from deflate.deflate import compress_file as deflate_compress, decompress_file as deflate_decompress, choose_settings
 from huffman.huffman import HuffmanCoding
 from lzw.lzw import compress_file as lzw_compress, decompress_file as lzw_decompress
 from burrowswheeler.burrowswheeler import compress as bwt_compress, decompress as bwt_decompress
+from compression.mapped_input import MappedInput
 from jpeg_2000.jpeg2000 import compress_image, decompress_image
 from pyflacaudio.Pyflac import compress_audio, decompress_audio
 
@@ -57,6 +58,10 @@ class CompressionHandler(QObject):
         self.compression_ratio = None
         self.use_encryption = False
         self.encryption_password = None
+        self.workers = None
+        self.random_access = False
+        self.auto_settings = False
+        self.target_speed = None
 
     def set_source_file(self, file_path):
         """Set the source file to compress/decompress"""
@@ -91,6 +96,23 @@ class CompressionHandler(QObject):
         self.use_encryption = use_encryption
         self.encryption_password = password
 
+    def set_workers(self, workers):
+        """Set the number of workers for algorithms that support parallel blocks"""
+        if workers is not None and workers < 1:
+            raise ValueError(f"Number of workers must be at least 1, got {workers}")
+        self.workers = workers
+
+    def set_random_access(self, random_access):
+        """Enable or disable writing a block index for range reads, where the algorithm supports it"""
+        self.random_access = random_access
+
+    def set_auto_settings(self, auto_settings, target_speed=None):
+        """Enable or disable choosing the deflate level and strategy by trial compression, optionally for a speed in MB/s"""
+        if target_speed is not None and target_speed <= 0:
+            raise ValueError(f"Target speed must be positive, got {target_speed}")
+        self.auto_settings = auto_settings
+        self.target_speed = target_speed
+
     def derive_key(self, password, salt=None):
         """Derive a 256-bit key from the password"""
         if salt is None:
@@ -101,10 +123,6 @@ class CompressionHandler(QObject):
 
     def encrypt_file(self, input_file, output_file, password):
         """Encrypt a file using AES-256"""
-        # Read the input file
-        with open(input_file, 'rb') as f:
-            data = f.read()
-        
         # Derive a key from the password
         key, salt = self.derive_key(password)
         
@@ -114,45 +132,35 @@ class CompressionHandler(QObject):
         # Create an encryptor
         cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
         encryptor = cipher.encryptor()
-        
-        # Pad the data
         padder = padding.PKCS7(128).padder()
-        padded_data = padder.update(data) + padder.finalize()
-        
-        # Encrypt the data
-        encrypted_data = encryptor.update(padded_data) + encryptor.finalize()
         
-        # Write the salt, IV, and encrypted data to the output file
-        with open(output_file, 'wb') as f:
+        # Write the salt and IV, then pad and encrypt the memory-mapped
+        # input chunk by chunk
+        with MappedInput(input_file) as source, open(output_file, 'wb') as f:
             f.write(salt)
             f.write(iv)
-            f.write(encrypted_data)
+            for chunk in source.chunks():
+                f.write(encryptor.update(padder.update(chunk)))
+            f.write(encryptor.update(padder.finalize()) + encryptor.finalize())
 
     def decrypt_file(self, input_file, output_file, password):
         """Decrypt a file using AES-256"""
-        # Read the input file
-        with open(input_file, 'rb') as f:
-            salt = f.read(16)
-            iv = f.read(16)
-            encrypted_data = f.read()
-        
-        # Derive the key from the password and salt
-        key, _ = self.derive_key(password, salt)
-        
-        # Create a decryptor
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-        decryptor = cipher.decryptor()
-        
-        # Decrypt the data
-        padded_data = decryptor.update(encrypted_data) + decryptor.finalize()
-        
-        # Unpad the data
-        unpadder = padding.PKCS7(128).unpadder()
-        data = unpadder.update(padded_data) + unpadder.finalize()
-        
-        # Write the decrypted data to the output file
-        with open(output_file, 'wb') as f:
-            f.write(data)
+        with MappedInput(input_file) as source, open(output_file, 'wb') as f:
+            salt = bytes(source.view[:16])
+            iv = bytes(source.view[16:32])
+            
+            # Derive the key from the password and salt
+            key, _ = self.derive_key(password, salt)
+            
+            # Create a decryptor
+            cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
+            decryptor = cipher.decryptor()
+            unpadder = padding.PKCS7(128).unpadder()
+            
+            # Decrypt and unpad chunk by chunk
+            for chunk in source.chunks(start=32):
+                f.write(unpadder.update(decryptor.update(chunk)))
+            f.write(unpadder.update(decryptor.finalize()) + unpadder.finalize())
 
     def compress(self, update_progress=None):
         """Compress the source file using the selected algorithm"""
@@ -171,6 +179,9 @@ class CompressionHandler(QObject):
             
             # Create a temporary file for the compressed output
             temp_output = self.destination_file + '.temp'
+
+            # Settings chosen by trial compression, reported with the result
+            settings = None
             
             # Text compression algorithms
             if self.algorithm == "deflate":
@@ -180,46 +191,52 @@ class CompressionHandler(QObject):
                     if hasattr(self, 'progress_updated'):
                         self.progress_updated.emit(progress)
                 
-                deflate_compress(self.source_file, temp_output if self.use_encryption else self.destination_file, progress_callback)
+                level, strategy = 9, "default"
+                if self.auto_settings:
+                    settings = choose_settings(self.source_file, self.target_speed)
+                    level, strategy = settings["level"], settings["strategy"]
+
+                deflate_compress(self.source_file, temp_output if self.use_encryption else self.destination_file, progress_callback,
+                                 level=level, workers=self.workers, index=self.random_access and not self.use_encryption,
+                                 strategy=strategy)
             elif self.algorithm == "huffman":
                 # Emit progress at key points
                 if hasattr(self, 'progress_updated'):
                     self.progress_updated.emit(25)  # Starting
                 
-                huffman_coder = HuffmanCoding(self.source_file)
+                # Text has strong byte-to-byte dependence; blocks fall back to
+                # a single table when per-context tables do not pay off
+                context_order = 1 if self.file_type == "text" else 0
+                huffman_coder = HuffmanCoding(self.source_file, workers=self.workers, context_order=context_order)
                 
                 if hasattr(self, 'progress_updated'):
                     self.progress_updated.emit(50)  # Halfway
                 
-                output_path = huffman_coder.compress()
+                # Written straight to the destination, so concurrent jobs do
+                # not share a temporary file
+                with open(temp_output if self.use_encryption else self.destination_file, 'wb') as f_out:
+                    huffman_coder.compress_to(f_out)
                 
                 if hasattr(self, 'progress_updated'):
                     self.progress_updated.emit(75)  # Almost done
-                
-                # Copy the compressed file to the destination
-                with open(output_path, 'rb') as f_in, open(temp_output if self.use_encryption else self.destination_file, 'wb') as f_out:
-                    f_out.write(f_in.read())
-                # Delete the temporary file created by HuffmanCoding
-                if os.path.exists(output_path):
-                    os.remove(output_path)
             elif self.algorithm == "lzw":
-                # Emit progress at key points
-                if hasattr(self, 'progress_updated'):
-                    self.progress_updated.emit(30)  # Starting
-                
-                lzw_compress(self.source_file, temp_output if self.use_encryption else self.destination_file)
+                # Emit progress updates from the bytes the encoder has consumed
+                def progress_callback(bytes_processed):
+                    progress = min(int((bytes_processed / total_size) * 100), 99)
+                    if hasattr(self, 'progress_updated'):
+                        self.progress_updated.emit(progress)
                 
-                if hasattr(self, 'progress_updated'):
-                    self.progress_updated.emit(90)  # Almost done
+                lzw_compress(self.source_file, temp_output if self.use_encryption else self.destination_file, progress_callback)
             elif self.algorithm == "bwt":
-                # Emit progress at key points
-                if hasattr(self, 'progress_updated'):
-                    self.progress_updated.emit(30)  # Starting
-                
-                bwt_compress(self.source_file, temp_output if self.use_encryption else self.destination_file)
+                # Emit progress updates from the bytes bzip2 has consumed
+                def progress_callback(bytes_processed):
+                    progress = min(int((bytes_processed / total_size) * 100), 99)
+                    if hasattr(self, 'progress_updated'):
+                        self.progress_updated.emit(progress)
                 
-                if hasattr(self, 'progress_updated'):
-                    self.progress_updated.emit(90)  # Almost done
+                bwt_compress(self.source_file, temp_output if self.use_encryption else self.destination_file,
+                             progress_callback=progress_callback, workers=self.workers,
+                             index=self.random_access and not self.use_encryption)
             # Image compression algorithms
             elif self.algorithm == "jpeg2000":
                 # Emit progress at key points
@@ -258,6 +275,8 @@ class CompressionHandler(QObject):
                 "time": self.compression_time,
                 "encrypted": self.use_encryption
             }
+            if settings:
+                result["settings"] = settings
             
             # Emit completion signal
             if hasattr(self, 'operation_completed'):
@@ -313,40 +332,32 @@ class CompressionHandler(QObject):
                 if hasattr(self, 'progress_updated'):
                     self.progress_updated.emit(30)  # Starting
                 
-                huffman_coder = HuffmanCoding(source_file)
+                huffman_coder = HuffmanCoding(source_file, workers=self.workers)
                 
                 if hasattr(self, 'progress_updated'):
                     self.progress_updated.emit(50)  # Halfway
                 
-                output_path = huffman_coder.decompress(source_file)
+                huffman_coder.decompress(source_file, self.destination_file)
                 
                 if hasattr(self, 'progress_updated'):
                     self.progress_updated.emit(75)  # Almost done
-                
-                # Copy the decompressed file to the destination
-                with open(output_path, 'rb') as f_in, open(self.destination_file, 'wb') as f_out:
-                    f_out.write(f_in.read())
-                # Delete the temporary file created by HuffmanCoding
-                if os.path.exists(output_path):
-                    os.remove(output_path)
             elif self.algorithm == "lzw":
-                # Emit progress at key points
-                if hasattr(self, 'progress_updated'):
-                    self.progress_updated.emit(30)  # Starting
-                
-                lzw_decompress(source_file, self.destination_file)
+                # Emit progress updates from the compressed bytes read
+                def progress_callback(bytes_processed):
+                    progress = min(20 + int((bytes_processed / total_size) * 80), 99)
+                    if hasattr(self, 'progress_updated'):
+                        self.progress_updated.emit(progress)
                 
-                if hasattr(self, 'progress_updated'):
-                    self.progress_updated.emit(90)  # Almost done
+                lzw_decompress(source_file, self.destination_file, progress_callback)
             elif self.algorithm == "bwt":
-                # Emit progress at key points
-                if hasattr(self, 'progress_updated'):
-                    self.progress_updated.emit(30)  # Starting
-                
-                bwt_decompress(source_file, self.destination_file)
+                # Emit progress updates from the compressed bytes read
+                def progress_callback(bytes_processed):
+                    progress = min(20 + int((bytes_processed / total_size) * 80), 99)
+                    if hasattr(self, 'progress_updated'):
+                        self.progress_updated.emit(progress)
                 
-                if hasattr(self, 'progress_updated'):
-                    self.progress_updated.emit(90)  # Almost done
+                bwt_decompress(source_file, self.destination_file, progress_callback=progress_callback,
+                               workers=self.workers)
             # Image decompression algorithms
             elif self.algorithm == "jpeg2000":
                 # Emit progress at key points
@@ -455,7 +466,7 @@ class CompressionHandler(QObject):
         else:
             self.compression_ratio = (1 - (compressed_size / original_size)) * 100
 
-    def process(self, algorithm, mode, input_file, output_file, use_threading=True, use_encryption=False, password=None):
+    def process(self, algorithm, mode, input_file, output_file, use_threading=True, use_encryption=False, password=None, workers=None):
         """
         Process a file using the specified algorithm and mode.
 
@@ -467,6 +478,7 @@ class CompressionHandler(QObject):
             use_threading (bool): Whether to run the operation in a separate thread
             use_encryption (bool): Whether to encrypt/decrypt the file
             password (str): Password for encryption/decryption
+            workers (int): Number of workers (processes, or threads for deflate) for parallel algorithms
 
         Returns:
             dict: Information about the compression/decompression process
@@ -475,6 +487,7 @@ class CompressionHandler(QObject):
         self.set_destination_file(output_file)
         self.set_algorithm(algorithm)
         self.set_encryption(use_encryption, password)
+        self.set_workers(workers)
 
         # Emit initial progress
         if hasattr(self, 'progress_updated'):
@@ -0,0 +1,73 @@
+# compression/mapped_input.py
+import mmap
+
+# Bytes per chunk handed out by MappedInput.chunks by default
+CHUNK_SIZE = 1 << 20
+
+class MappedInput:
+    """
+    Read-only memory map of an input file, shared by the file codecs.
+
+    Codecs take memoryview slices of ``view`` instead of reading the file
+    into new bytes objects, so pages already in the page cache are not
+    copied into the Python heap and only the pages being worked on need to
+    be resident.  Empty files and files that cannot be mapped, such as
+    pipes, are read into memory instead.
+
+    Use it as a context manager:
+
+        with MappedInput(path) as source:
+            for chunk in source.chunks():
+                output.write(compressor.compress(chunk))
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.map = None
+        with open(path, 'rb') as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty or not mappable
+                self.view = memoryview(f.read())
+            else:
+                if hasattr(self.map, 'madvise'):
+                    # Codecs read front to back; lets the kernel read ahead
+                    # and drop pages behind
+                    self.map.madvise(mmap.MADV_SEQUENTIAL)
+                self.view = memoryview(self.map)
+
+    def __len__(self):
+        return len(self.view)
+
+    def chunks(self, size=CHUNK_SIZE, start=0):
+        """
+        Yield consecutive memoryview slices of the file.
+
+        Args:
+            size (int): Bytes per slice; None or 0 yields the rest of the
+                file as one slice.
+            start (int): Offset of the first slice.
+        """
+        end = len(self.view)
+        size = size or max(end - start, 1)
+        for offset in range(start, end, size):
+            yield self.view[offset:offset + size]
+
+    def close(self):
+        """Release the view and unmap the file"""
+        self.view.release()
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # A slice is still referenced; the map is closed when it is
+                # garbage collected
+                pass
+            self.map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,30 @@
+# compression/parallel.py
+from collections import deque
+
+def ordered_results(executor, function, arguments, window):
+    """
+    Run a function over a sequence of arguments in an executor, shared by
+    the codecs that work on independent blocks.
+
+    At most ``window`` jobs are in flight, so only a bounded number of
+    blocks is held in memory however long the input is.  Arguments sent to
+    a process pool are pickled, so memoryview slices of a MappedInput must
+    be copied to bytes first.
+
+    Args:
+        executor (concurrent.futures.Executor): Pool to run the jobs in.
+        function (callable): Function to call; a module-level function
+            when the executor is a process pool.
+        arguments (iterable): Argument tuple of every call.
+        window (int): Largest number of jobs submitted but not yet yielded.
+
+    Yields:
+        The result of every call, in the order of ``arguments``.
+    """
+    pending = deque()
+    for args in arguments:
+        pending.append(executor.submit(function, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -1,35 +1,600 @@
 # deflate/deflate.py
-import zlib
+import bisect
+import heapq
 import os
+import time
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from compression.mapped_input import MappedInput
+from compression.parallel import ordered_results
+
+# Bytes read, and at most written, per step of compress and decompress
+BUFFER_SIZE = 1 << 20
+
+# Input bytes per block of parallel compression, as pigz
+BLOCK_SIZE = 1 << 17
+
+# Deflate window; every parallel block is primed with this much of the
+# input before it
+WINDOW_SIZE = 1 << 15
+
+# wbits for compressobj, by container
+WRAPPERS = {"zlib": zlib.MAX_WBITS, "gzip": 16 + zlib.MAX_WBITS}
+
+# First bytes of a gzip member
+GZIP_MAGIC = b'\x1f\x8b'
+
+STRATEGIES = {
+    "default": zlib.Z_DEFAULT_STRATEGY,
+    "filtered": zlib.Z_FILTERED,
+    "rle": zlib.Z_RLE,
+    "huffman_only": zlib.Z_HUFFMAN_ONLY
+}
+
+# Settings choose_settings tries.  rle and huffman_only do not search for
+# matches, so their level makes no difference.
+TRIAL_SETTINGS = [
+    (1, "default"), (6, "default"), (9, "default"),
+    (6, "filtered"), (9, "filtered"),
+    (6, "rle"), (6, "huffman_only")
+]
+
+# choose_settings compresses SAMPLE_COUNT pieces of SAMPLE_SIZE bytes spread
+# over the file
+SAMPLE_SIZE = 1 << 16
+SAMPLE_COUNT = 4
+
+# Without a speed target, the fastest setting whose output is within this
+# fraction of the smallest is chosen
+SIZE_TOLERANCE = 0.01
+
+# Preset dictionaries are stored as <directory>/<id>DICTIONARY_SUFFIX, the
+# id being the adler32 checksum that zlib writes as DICTID in the header of
+# every stream compressed with the dictionary
+DICTIONARY_SUFFIX = '.zdict'
+
+# Dictionary training picks SEGMENT_SIZE byte pieces of the samples that
+# cover the most GRAM_SIZE byte strings seen in several samples
+SEGMENT_SIZE = 256
+GRAM_SIZE = 8
+
+# Random access index, kept in a sidecar file next to the archive as for
+# bzip2.  Every INDEX_SPAN input bytes the compressor sync flushes, which
+# byte aligns the deflate data, and an access point records the input
+# offset, the archive offset and the 32 KB of input before it, from which
+# a raw inflater can start.  Layout: the zlib compressed windows, then for
+# every point its input offset, archive offset, window offset and window
+# length (8 bytes each, big-endian), one more entry with the input size and
+# the archive size, the entry count (8 bytes) and INDEX_MAGIC.
+INDEX_MAGIC = b'ZIDX'
+INDEX_SUFFIX = '.idx'
+INDEX_SPAN = 1 << 20
+
+def _compressor(level, wbits, strategy="default", dictionary=None):
+    if dictionary:
+        return zlib.compressobj(level, zlib.DEFLATED, wbits, zlib.DEF_MEM_LEVEL, STRATEGIES[strategy], dictionary)
+    return zlib.compressobj(level, zlib.DEFLATED, wbits, zlib.DEF_MEM_LEVEL, STRATEGIES[strategy])
+
+def _compress_block(block, dictionary, level, strategy, last):
+    """Worker: raw deflate of one block, byte aligned by a sync flush unless it is the last"""
+    compressor = _compressor(level, -zlib.MAX_WBITS, strategy, dictionary)
+    return len(block), compressor.compress(block) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+def dictionary_id(dictionary):
+    """Return the id zlib stores in the header of streams compressed with ``dictionary``"""
+    return zlib.adler32(dictionary)
+
+def _segment_grams(sample, start, frequent):
+    return {sample[i:i + GRAM_SIZE] for i in range(start, min(start + SEGMENT_SIZE, len(sample)) - GRAM_SIZE + 1)} & frequent
+
+def train_dictionary(sample_files, size=WINDOW_SIZE):
+    """
+    Train a preset dictionary on files similar to the ones to compress.
+
+    Strings are counted once per sample, so the dictionary favours content
+    shared between files over repeats within one.  Segments are picked
+    greedily by the count of the strings they cover that no earlier segment
+    covers, and the best segments are placed at the end of the dictionary,
+    where deflate reaches them with the shortest distances.
+
+    Args:
+        sample_files (list): Paths of the sample files.
+        size (int): Maximum dictionary size; deflate only uses the last
+            32 KB.
+
+    Returns:
+        bytes: The dictionary, empty if the samples share nothing.
+    """
+    samples = []
+    for sample_file in sample_files:
+        with open(sample_file, 'rb') as f:
+            samples.append(f.read())
+
+    counts = Counter()
+    for sample in samples:
+        counts.update({sample[i:i + GRAM_SIZE] for i in range(len(sample) - GRAM_SIZE + 1)})
+    frequent = {gram for gram, count in counts.items() if count > 1}
+
+    # Lazy greedy: scores only drop as strings are covered, so a segment
+    # whose rescored value still beats the next stale score is the best
+    heap = []
+    for index, sample in enumerate(samples):
+        for start in range(0, len(sample), SEGMENT_SIZE):
+            score = sum(counts[gram] for gram in _segment_grams(sample, start, frequent))
+            if score:
+                heap.append((-score, index, start))
+    heapq.heapify(heap)
+
+    covered = set()
+    segments = []
+    total = 0
+    while heap and total < size:
+        _, index, start = heapq.heappop(heap)
+        grams = _segment_grams(samples[index], start, frequent) - covered
+        score = sum(counts[gram] for gram in grams)
+        if not score:
+            continue
+        if heap and score < -heap[0][0]:
+            heapq.heappush(heap, (-score, index, start))
+            continue
+        covered |= grams
+        segment = samples[index][start:start + SEGMENT_SIZE]
+        segments.append(segment)
+        total += len(segment)
+    return b''.join(reversed(segments))[-size:]
+
+def save_dictionary(dictionary, directory):
+    """
+    Store a dictionary under its id.
+
+    Returns:
+        int: The dictionary id.
+    """
+    dict_id = dictionary_id(dictionary)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{dict_id:08x}{DICTIONARY_SUFFIX}"), 'wb') as f:
+        f.write(dictionary)
+    return dict_id
+
+def load_dictionary(dict_id, directory):
+    """
+    Load a dictionary stored by save_dictionary.
+
+    Raises:
+        ValueError: If the directory has no dictionary with this id.
+    """
+    path = os.path.join(directory, f"{dict_id:08x}{DICTIONARY_SUFFIX}")
+    if not os.path.exists(path):
+        raise ValueError(f"Preset dictionary {dict_id:08x} not found in {directory}")
+    with open(path, 'rb') as f:
+        dictionary = f.read()
+    if dictionary_id(dictionary) != dict_id:
+        raise ValueError(f"Preset dictionary file {path} is corrupt")
+    return dictionary
+
+def _header_dictionary_id(header):
+    # DICTID of a zlib header with FDICT set, else None
+    if len(header) < 6 or header[0] & 0x0f != 8 or (header[0] << 8 | header[1]) % 31 or not header[1] & 0x20:
+        return None
+    return int.from_bytes(header[2:6], byteorder='big')
+
+class DictionaryCodec:
+    """
+    Compress many small inputs with one preset dictionary.
+
+    The dictionary is loaded once into a primed compressor and every input
+    is compressed on a copy of it, so the dictionary is not hashed again for
+    each input.  Output is a standard zlib stream carrying the dictionary id.
+    The default level is 6: with a dictionary it already compresses small
+    inputs better than level 9 without one, and level 9 searches the whole
+    dictionary for every match.
+    """
+
+    def __init__(self, dictionary, level=6):
+        self.dictionary = dictionary
+        self.dictionary_id = dictionary_id(dictionary)
+        self.__primed = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, zdict=dictionary)
 
-def compress_file(input_file, output_file, progress_callback=None):
-    # Get file size for progress calculation
-    file_size = os.path.getsize(input_file)
-    
+    def compress(self, data):
+        """Compress a bytes-like object; returns the zlib stream"""
+        compressor = self.__primed.copy()
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data):
+        """
+        Decompress a zlib stream made with this dictionary.
+
+        Raises:
+            ValueError: If the stream was made with another dictionary.
+        """
+        dict_id = _header_dictionary_id(data[:6])
+        if dict_id is not None and dict_id != self.dictionary_id:
+            raise ValueError(f"Stream needs preset dictionary {dict_id:08x}, not {self.dictionary_id:08x}")
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS, zdict=self.dictionary)
+        return decompressor.decompress(data) + decompressor.flush()
+
+    def compress_file(self, input_file, output_file):
+        """Compress a small file in one step"""
+        with open(input_file, 'rb') as f:
+            data = f.read()
+        with open(output_file, 'wb') as f:
+            f.write(self.compress(data))
+
+    def decompress_file(self, input_file, output_file):
+        """Decompress a small file in one step"""
+        with open(input_file, 'rb') as f:
+            data = f.read()
+        with open(output_file, 'wb') as f:
+            f.write(self.decompress(data))
+
+def _header(wrapper, level, dictionary=None):
+    if wrapper == "gzip":
+        # No name or time stamp; extra flags say best or fastest
+        extra_flags = 2 if level == 9 else 4 if level == 1 else 0
+        return GZIP_MAGIC + b'\x08\x00\x00\x00\x00\x00' + bytes([extra_flags, 255])
+    # Deflate with a 32 KB window; FLEVEL is informative only
+    flags = (0 if level < 2 else 1 if level < 6 else 2 if level == 6 else 3) << 6
+    if dictionary:
+        flags |= 0x20
+    flags += 31 - (0x7800 + flags) % 31
+    if dictionary:
+        return bytes([0x78, flags]) + dictionary_id(dictionary).to_bytes(4, byteorder='big')
+    return bytes([0x78, flags])
+
+def _read_blocks(source, block_size, dictionary=b''):
+    # Yields (block, window, last); blocks and, past the first window,
+    # windows are slices of the mapped input
+    end = len(source)
+    for offset in range(0, max(end, 1), block_size):
+        if offset >= WINDOW_SIZE:
+            window = source.view[offset - WINDOW_SIZE:offset]
+        else:
+            window = (dictionary + source.view[:offset])[-WINDOW_SIZE:]
+        yield source.view[offset:offset + block_size], window, offset + block_size >= end
+
+def _read_sample(input_file):
+    # SAMPLE_COUNT evenly spaced pieces, or the whole file if it is smaller
+    size = os.path.getsize(input_file)
     with open(input_file, 'rb') as f:
-        data = f.read()
-        
-        # Call progress callback with bytes read
-        if progress_callback:
-            progress_callback(file_size)
-            
-    compressed_data = zlib.compress(data, level=9)
-    
-    with open(output_file, 'wb') as f:
-        f.write(compressed_data)
-
-def decompress_file(input_file, output_file, progress_callback=None):
-    # Get file size for progress calculation
-    file_size = os.path.getsize(input_file)
-    
+        if size <= SAMPLE_SIZE * SAMPLE_COUNT:
+            return f.read()
+        pieces = []
+        for i in range(SAMPLE_COUNT):
+            f.seek((size - SAMPLE_SIZE) * i // (SAMPLE_COUNT - 1))
+            pieces.append(f.read(SAMPLE_SIZE))
+    return b''.join(pieces)
+
+def choose_settings(input_file, target_speed=None):
+    """
+    Pick a compression level and strategy by trial compressing a sample.
+
+    Every setting in TRIAL_SETTINGS compresses a sample spread over the
+    file.  With a speed target the smallest output among the settings that
+    reach it wins, or the fastest setting if none does.  Without one the
+    fastest setting within SIZE_TOLERANCE of the smallest output wins, so
+    dense data does not pay for level 9 searches that gain nothing.
+
+    Args:
+        input_file (str): Path to the file to compress.
+        target_speed (float): Minimum compression speed in MB/s, or None
+            to favour ratio.
+
+    Returns:
+        dict: The chosen "level" and "strategy", the "sample_size" and the
+            "trials", each with its level, strategy, compressed size, ratio
+            (in percent, as the handler reports it) and speed in MB/s.
+    """
+    sample = _read_sample(input_file)
+    trials = []
+    for level, strategy in TRIAL_SETTINGS:
+        start_time = time.perf_counter()
+        compressor = _compressor(level, zlib.MAX_WBITS, strategy)
+        size = len(compressor.compress(sample)) + len(compressor.flush())
+        elapsed = max(time.perf_counter() - start_time, 1e-9)
+        trials.append({
+            "level": level,
+            "strategy": strategy,
+            "compressed_size": size,
+            "ratio": (1 - size / len(sample)) * 100 if sample else 0,
+            "speed": len(sample) / elapsed / 1e6
+        })
+
+    if target_speed is not None:
+        fast_enough = [trial for trial in trials if trial["speed"] >= target_speed]
+        if fast_enough:
+            best = min(fast_enough, key=lambda trial: trial["compressed_size"])
+        else:
+            best = max(trials, key=lambda trial: trial["speed"])
+    else:
+        smallest = min(trial["compressed_size"] for trial in trials)
+        close = [trial for trial in trials if trial["compressed_size"] <= smallest * (1 + SIZE_TOLERANCE)]
+        best = max(close, key=lambda trial: trial["speed"])
+
+    return {
+        "level": best["level"],
+        "strategy": best["strategy"],
+        "sample_size": len(sample),
+        "trials": trials
+    }
+
+def compress_file(input_file, output_file, progress_callback=None, level=9, buffer_size=BUFFER_SIZE, workers=None,
+                  wrapper="zlib", dictionary=None, index=False, strategy="default"):
+    """
+    Compresses a file into a zlib or gzip stream, streaming it in chunks.
+
+    With several workers the input is cut into BLOCK_SIZE blocks that are
+    compressed in a thread pool, as pigz does: zlib releases the GIL while
+    it compresses.  Each block is primed with the 32 KB of input before it
+    as a preset dictionary, so matches reach across block boundaries, and
+    all but the last end in a sync flush so the raw deflate blocks can be
+    joined into one stream.  The result is a single standard stream, a few
+    bytes per block larger than a sequential one.
+
+    Args:
+        input_file (str): Path to the input file.
+        output_file (str): Path to the output compressed file.
+        progress_callback (callable): Called with the number of input bytes
+            processed so far after every step.
+        level (int): zlib compression level, from 0 to 9.
+        buffer_size (int): Bytes read per step; memory use does not depend
+            on the file size.
+        workers (int): Number of worker threads; None or 1 compresses in
+            this thread.
+        wrapper (str): Container of the deflate data, "zlib" or "gzip".
+        dictionary (bytes): Preset dictionary, e.g. from train_dictionary;
+            its id is stored in the zlib header.  Not available with gzip.
+        index (bool): Sync flush every INDEX_SPAN input bytes and save the
+            access points to output_file followed by INDEX_SUFFIX, for
+            read_range.
+        strategy (str): zlib strategy, one of STRATEGIES; choose_settings
+            picks a level and strategy for a file.
+    """
+    if wrapper not in WRAPPERS:
+        raise ValueError(f"Unsupported wrapper: {wrapper}. Choose from {list(WRAPPERS)}")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unsupported strategy: {strategy}. Choose from {list(STRATEGIES)}")
+    if dictionary and wrapper == "gzip":
+        raise ValueError("The gzip format cannot record a preset dictionary; use the zlib wrapper")
+    index_file = output_file + INDEX_SUFFIX if index else None
+    if workers and workers > 1:
+        _compress_parallel(input_file, output_file, progress_callback, level, strategy, workers, wrapper, dictionary,
+                           index_file)
+        return
+    compressor = _compressor(level, WRAPPERS[wrapper], strategy, dictionary)
+    # zlib writes the header with the first output; the first access point
+    # is right after it
+    position = len(_header(wrapper, level, dictionary))
+    window = (dictionary or b'')[-WINDOW_SIZE:]
+    points = []
+    processed = 0
+    with MappedInput(input_file) as source, open(output_file, 'wb') as output:
+        for chunk in source.chunks(INDEX_SPAN if index else buffer_size):
+            if index:
+                points.append((processed, position, window))
+                window = (window + chunk[-WINDOW_SIZE:])[-WINDOW_SIZE:]
+                output.write(compressor.compress(chunk))
+                output.write(compressor.flush(zlib.Z_SYNC_FLUSH))
+                position = output.tell()
+            else:
+                output.write(compressor.compress(chunk))
+            processed += len(chunk)
+            if progress_callback:
+                progress_callback(processed)
+        output.write(compressor.flush())
+        size = output.tell()
+    if index:
+        write_index(index_file, points, processed, size)
+
+def _compress_parallel(input_file, output_file, progress_callback, level, strategy, workers, wrapper, dictionary,
+                       index_file):
+    gzip = wrapper == "gzip"
+    checksum = zlib.crc32(b'') if gzip else zlib.adler32(b'')
+    # Blocks already start byte aligned with their window known, so access
+    # points are taken at the first block start of every span
+    windows = deque()
+    points = []
+    processed = 0
+    with MappedInput(input_file) as source, open(output_file, 'wb') as output:
+        output.write(_header(wrapper, level, dictionary))
+
+        def blocks():
+            # The checksum needs the input in order, so it is computed here
+            # while the workers compress
+            nonlocal checksum
+            for block, window, last in _read_blocks(source, BLOCK_SIZE, (dictionary or b'')[-WINDOW_SIZE:]):
+                checksum = zlib.crc32(block, checksum) if gzip else zlib.adler32(block, checksum)
+                windows.append(window)
+                yield block, window, level, strategy, last
+
+        with ThreadPoolExecutor(workers) as executor:
+            for size, compressed in ordered_results(executor, _compress_block, blocks(), 2 * workers):
+                window = windows.popleft()
+                if index_file and size and (not points or processed - points[-1][0] >= INDEX_SPAN):
+                    points.append((processed, output.tell(), bytes(window)))
+                output.write(compressed)
+                processed += size
+                # An empty input still yields one, empty, block; report no
+                # progress for it, as the sequential path does
+                if progress_callback and size:
+                    progress_callback(processed)
+        if gzip:
+            output.write(checksum.to_bytes(4, byteorder='little'))
+            output.write((processed & 0xffffffff).to_bytes(4, byteorder='little'))
+        else:
+            output.write(checksum.to_bytes(4, byteorder='big'))
+        size = output.tell()
+    if index_file:
+        write_index(index_file, points, processed, size)
+
+def write_index(index_file, points, input_size, archive_size):
+    """
+    Write a random access index.
+
+    Args:
+        index_file (str): Path to the index file.
+        points (list): (input offset, archive offset, window) of every
+            access point, the window being the input before the point.
+        input_size (int): Size of the uncompressed data.
+        archive_size (int): Size of the compressed file.
+    """
+    entries = []
+    with open(index_file, 'wb') as f:
+        for processed, position, window in points:
+            compressed = zlib.compress(window) if window else b''
+            entries.append((processed, position, f.tell(), len(compressed)))
+            f.write(compressed)
+        entries.append((input_size, archive_size, 0, 0))
+        for entry in entries:
+            for value in entry:
+                f.write(value.to_bytes(8, byteorder='big'))
+        f.write(len(entries).to_bytes(8, byteorder='big'))
+        f.write(INDEX_MAGIC)
+
+def read_index(index_file):
+    """
+    Read the entries of a random access index written by write_index.
+
+    Returns:
+        list: (input offset, archive offset, window offset, window length)
+            of every access point followed by (input size, archive size,
+            0, 0), or None if the file is missing or is not an index.
+    """
+    if not os.path.exists(index_file):
+        return None
+    with open(index_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if end < 12:
+            return None
+        f.seek(end - 12)
+        footer = f.read(12)
+        count = int.from_bytes(footer[:8], byteorder='big')
+        if footer[8:] != INDEX_MAGIC or count < 1 or 32 * count + 12 > end:
+            return None
+        f.seek(end - 12 - 32 * count)
+        data = f.read(32 * count)
+    return [tuple(int.from_bytes(data[i + j:i + j + 8], byteorder='big') for j in range(0, 32, 8))
+            for i in range(0, len(data), 32)]
+
+def read_range(input_file, offset, length, index_file=None, buffer_size=BUFFER_SIZE):
+    """
+    Decompress a byte range of an indexed archive, starting from the
+    nearest access point before it.
+
+    Args:
+        input_file (str): Path to an archive written with index=True.
+        offset (int): Uncompressed offset of the first byte to read.
+        length (int): Number of bytes to read; the range is cut at the end
+            of the data.
+        index_file (str): Path to the index; defaults to the archive path
+            followed by INDEX_SUFFIX.
+        buffer_size (int): Compressed bytes read, and at most decompressed
+            bytes held, per step.
+
+    Returns:
+        bytes: The requested range.
+
+    Raises:
+        ValueError: If the range is negative, or the index is missing or
+            does not belong to the archive.
+    """
+    if offset < 0 or length < 0:
+        raise ValueError(f"Invalid range: offset {offset}, length {length}")
+    index_file = index_file or input_file + INDEX_SUFFIX
+    entries = read_index(index_file)
+    if entries is None:
+        raise ValueError(f"No access point index found at {index_file}; compress with index=True")
+    if os.path.getsize(input_file) != entries[-1][1]:
+        raise ValueError(f"Index {index_file} does not match {input_file}")
+    end = min(offset + length, entries[-1][0])
+    if offset >= end:
+        return b''
+
+    point, position, window_offset, window_length = entries[bisect.bisect_right([e[0] for e in entries[:-1]], offset) - 1]
+    window = b''
+    if window_length:
+        with open(index_file, 'rb') as f:
+            f.seek(window_offset)
+            window = zlib.decompress(f.read(window_length))
+    if window:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=window)
+    else:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+    result = bytearray()
     with open(input_file, 'rb') as f:
-        compressed_data = f.read()
-        
-        # Call progress callback with bytes read
-        if progress_callback:
-            progress_callback(file_size)
-            
-    decompressed_data = zlib.decompress(compressed_data)
-    
-    with open(output_file, 'wb') as f:
-        f.write(decompressed_data)
+        f.seek(position)
+        while point < end:
+            if decompressor.eof:
+                raise ValueError(f"Index {index_file} does not match {input_file}")
+            data = decompressor.unconsumed_tail or f.read(buffer_size)
+            decoded = decompressor.decompress(data, buffer_size)
+            if not data and not decoded:
+                raise ValueError(f"Index {index_file} does not match {input_file}")
+            # Only the part of the output inside the range is kept
+            result += decoded[max(offset - point, 0):end - point]
+            point += len(decoded)
+    return bytes(result)
+
+def decompress_file(input_file, output_file, progress_callback=None, buffer_size=BUFFER_SIZE, dictionary_dir=None):
+    """
+    Decompresses a zlib or gzip stream, streaming it in chunks.
+
+    gzip files made of several concatenated members, as written by
+    ``cat a.gz b.gz``, are decompressed in full.
+
+    Args:
+        input_file (str): Path to the compressed file.
+        output_file (str): Path to save the decompressed file.
+        progress_callback (callable): Called with the number of compressed
+            bytes processed so far after every step.
+        buffer_size (int): Compressed bytes read, and at most decompressed
+            bytes held, per step.
+        dictionary_dir (str): Directory of dictionaries stored by
+            save_dictionary, for streams made with a preset dictionary.
+
+    Raises:
+        zlib.error: If the data is not valid zlib or gzip, the file ends
+            in the middle of the stream, or data follows a zlib stream.
+        ValueError: If the stream needs a preset dictionary that is not in
+            dictionary_dir.
+    """
+    processed = 0
+    with open(input_file, 'rb') as f, open(output_file, 'wb') as output:
+        header = f.read(6)
+        dict_id = _header_dictionary_id(header)
+        # gzip files may hold several members, each a complete gzip stream
+        members = header[:2] == GZIP_MAGIC
+        f.seek(0)
+        if dict_id is not None:
+            if dictionary_dir is None:
+                raise ValueError(f"Stream needs preset dictionary {dict_id:08x}; pass dictionary_dir")
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS, zdict=load_dictionary(dict_id, dictionary_dir))
+        else:
+            # The container is detected from the header
+            decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        chunk = f.read(buffer_size)
+        while chunk:
+            data = chunk
+            while True:
+                if decompressor.eof and (data or decompressor.unused_data):
+                    if not members:
+                        raise zlib.error("Trailing data after the end of the stream")
+                    # The next member starts in the bytes after this one
+                    data = decompressor.unused_data + data
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                if not data:
+                    break
+                # Bound the output of every call; the rest of the input
+                # waits in unconsumed_tail
+                output.write(decompressor.decompress(data, buffer_size))
+                data = decompressor.unconsumed_tail
+            processed += len(chunk)
+            if progress_callback:
+                progress_callback(processed)
+            chunk = f.read(buffer_size)
+        output.write(decompressor.flush())
+    if not decompressor.eof:
+        raise zlib.error("Error -5 while decompressing data: incomplete or truncated stream")
@@ -208,11 +208,9 @@ class CompressionApp(QWidget):
             elif algorithm == 'huffman':
                 huffman = HuffmanCoding(input_file)
                 if mode == 'compress':
-                    output_path = huffman.compress()
-                    os.rename(output_path, output_file)
+                    huffman.compress(output_file)
                 else:
-                    huffman.decompress(input_file)
-                    os.rename('decompressed_file.txt', output_file)
+                    huffman.decompress(input_file, output_file)
             
             elif algorithm == 'lzw':
                 if mode == 'compress':
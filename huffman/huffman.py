@@ -1,7 +1,174 @@
 # huffman/huffman.py
 import heapq
+import io
 import os
-import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from compression.mapped_input import MappedInput
+from compression.parallel import ordered_results
+
+# Archive layout: magic, then a sequence of blocks, each starting with a block
+# type (1 byte) and the number of bytes it encodes (8 bytes), then a
+# BLOCK_END byte and a block index.  A Huffman block continues with the
+# number of coded symbols (2 bytes), one (symbol, code length) pair per
+# symbol and the payload length in bytes (8 bytes).  Codes are canonical, so
+# the lengths alone are enough for the decoder to rebuild them.  The payload
+# is followed by a sync index: the number of bits used by every
+# SYNC_INTERVAL symbols (2 bytes each), which lets the decoder start at many
+# points at once.  A stored block holds the input bytes unchanged.  A context
+# block codes every byte with a table chosen by the byte before it; see
+# __encode_context_block for its layout.  The block index lists the file
+# offset and input size of every block (8 bytes each), followed by the
+# number of blocks (8 bytes) and INDEX_MAGIC, so blocks can be located
+# without scanning.
+MAGIC = b'HUF\x04'
+INDEX_MAGIC = b'HIDX'
+
+# Adaptive streams: magic, then frames of the number of symbols (4 bytes), the
+# payload length (4 bytes), the payload and its sync index.  A frame of zero
+# symbols ends the stream.  Encoder and decoder start from the same flat model
+# and rebuild the code after every frame, so no code tables are stored.
+ADAPTIVE_MAGIC = b'HUFA'
+
+# Input bytes per adaptive frame; bounds the encoder latency.
+ADAPTIVE_SEGMENT_SIZE = 1 << 16
+
+# Adaptive codes stay short so every frame decodes from one small table.
+ADAPTIVE_MAX_CODE_LENGTH = 12
+
+# Symbol counts are halved once they add up to this, so the code follows
+# recent data.
+ADAPTIVE_RESCALE_LIMIT = 1 << 20
+
+BLOCK_STORED = 0
+BLOCK_HUFFMAN = 1
+BLOCK_CONTEXT = 2
+BLOCK_END = 255
+
+# Default number of input bytes per block; each block gets its own code table.
+BLOCK_SIZE = 1 << 20
+
+# Number of input bytes packed per step; bounds the temporary bit arrays.
+ENCODE_CHUNK_SIZE = 1 << 18
+
+# Largest single read of the decoder; sizes come from the archive, so a
+# corrupt one must not be handed to file.read() whole.
+READ_SIZE = 1 << 20
+
+# Symbols per sync index entry. 512 codes of at most 64 bits always fit the
+# 2-byte entries.
+SYNC_INTERVAL = 512
+
+# Bits looked up per decode step; longer codes take the slow path.
+TABLE_BITS = 12
+
+# Codes up to this long are decoded entirely from the lookup table, which then
+# still fits in L2 cache (2 bytes per entry).
+MAX_TABLE_BITS = 15
+
+# Number of sync groups decoded side by side in one batch.
+DECODE_LANES = 2048
+
+# Code length limit in context blocks; keeps one lookup table per context
+# small and avoids the slow path entirely.
+CONTEXT_MAX_CODE_LENGTH = 12
+
+def limited_code_lengths(frequencies, max_length):
+    """
+    Compute optimal code lengths that do not exceed ``max_length`` bits.
+
+    Uses the package-merge algorithm: every symbol is a coin at each of the
+    ``max_length`` denominations, coins are repeatedly packaged in pairs and
+    merged with the original coins, and the 2n - 2 cheapest items at the top
+    level decide how many bits each symbol gets.
+
+    Args:
+        frequencies (dict): Number of occurrences of every symbol.
+        max_length (int): Maximum code length in bits.
+
+    Returns:
+        dict: Code length for every symbol.
+    """
+    if len(frequencies) == 1:
+        return {char: 1 for char in frequencies}
+    if len(frequencies) > 1 << max_length:
+        raise ValueError(f"{len(frequencies)} symbols cannot be coded in {max_length} bits")
+
+    leaves = sorted((frequency, [char]) for char, frequency in frequencies.items())
+    items = leaves
+    for _ in range(max_length - 1):
+        packages = [(items[i][0] + items[i + 1][0], items[i][1] + items[i + 1][1])
+                    for i in range(0, len(items) - 1, 2)]
+        items = list(heapq.merge(leaves, packages, key=lambda item: item[0]))
+
+    lengths = dict.fromkeys(frequencies, 0)
+    for _, chars in items[:2 * len(frequencies) - 2]:
+        for char in chars:
+            lengths[char] += 1
+    return lengths
+
+def _compress_block(block, max_code_length, context_order):
+    """Encode one block in a worker process; returns (input size, encoded block)"""
+    output = io.BytesIO()
+    huffman_coder = HuffmanCoding(None, max_code_length=max_code_length, context_order=context_order)
+    huffman_coder.encode_block(np.frombuffer(block, dtype=np.uint8), output)
+    return len(block), output.getvalue()
+
+def _decompress_block(block):
+    """Decode one encoded block in a worker process"""
+    output = io.BytesIO()
+    HuffmanCoding(None).decode_block(io.BytesIO(block), output)
+    return output.getvalue()
+
+def pack_table(code_lengths):
+    """
+    Serialize a code-length table with lengths of at most 15 bits.
+
+    Layout: number of symbols minus one (1 byte), the symbols in ascending
+    order, then their lengths packed two per byte.
+    """
+    chars = sorted(code_lengths)
+    lengths = [code_lengths[char] for char in chars] + [0]
+    packed = bytes((lengths[i] << 4) | lengths[i + 1] for i in range(0, len(chars), 2))
+    return bytes([len(chars) - 1]) + bytes(chars) + packed
+
+def packed_table_size(code_lengths):
+    """Number of bytes pack_table uses for ``code_lengths``"""
+    return 1 + len(code_lengths) + (len(code_lengths) + 1) // 2
+
+def fill_table(symbols, lengths, code_lengths, table_bits):
+    """Fill peek-table rows for every code of at most ``table_bits`` bits"""
+    for char, code in canonical_codes(code_lengths).items():
+        length = code_lengths[char]
+        if length <= table_bits:
+            start = code << (table_bits - length)
+            end = (code + 1) << (table_bits - length)
+            symbols[start:end] = char
+            lengths[start:end] = length
+
+def canonical_codes(code_lengths):
+    """
+    Assign canonical Huffman codes.
+
+    Symbols sorted by (length, symbol) get consecutive codes, so only the
+    lengths need to be stored.
+
+    Args:
+        code_lengths (dict): Code length for every coded symbol.
+
+    Returns:
+        dict: Code (as an int) for every coded symbol.
+    """
+    encoding_map = {}
+    code = 0
+    previous_length = 0
+    for length, char in sorted((length, char) for char, length in code_lengths.items()):
+        code <<= length - previous_length
+        encoding_map[char] = code
+        code += 1
+        previous_length = length
+    return encoding_map
 
 class BinaryTree:
     def __init__(self, char, frequency, left=None, right=None):
@@ -19,129 +186,732 @@ class BinaryTree:
     def __gt__(self, other):
         return self.frequency > other.frequency
 
+class BitWriter:
+    """
+    Packs variable-length codes MSB-first into bytes written to a file object.
+
+    Codes are looked up per symbol from ``codes``/``lengths`` arrays and placed
+    into 64-bit words with NumPy, so no per-bit Python objects are created.
+    Codes may be up to 64 bits long. Bits that do not fill a whole word are
+    carried over to the next call.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.pending_word = np.uint64(0)
+        self.pending_bits = 0
+
+    def write(self, symbols, codes, lengths):
+        code_lengths = lengths[symbols].astype(np.int64)
+        if len(code_lengths) == 0:
+            return
+        symbol_codes = codes[symbols]
+        ends = np.cumsum(code_lengths) + self.pending_bits
+        total_bits = int(ends[-1])
+        starts = ends - code_lengths
+        word_index = starts >> 6
+        # Align each code to its place in its first word; a negative shift
+        # means the code spills over into the following word.
+        shift = 64 - (starts & 63) - code_lengths
+        parts = (symbol_codes << np.maximum(shift, 0).astype(np.uint64)) >> np.maximum(-shift, 0).astype(np.uint64)
+
+        words = np.zeros((total_bits + 63) // 64, dtype=np.uint64)
+        words[0] = self.pending_word
+        # Codes never overlap, so OR-ing all parts that start in the same
+        # word assembles it.
+        first = np.flatnonzero(np.diff(word_index, prepend=-1))
+        words[word_index[first]] |= np.bitwise_or.reduceat(parts, first)
+        spill = np.flatnonzero(shift < 0)
+        if len(spill):
+            words[word_index[spill] + 1] |= symbol_codes[spill] << (64 + shift[spill]).astype(np.uint64)
+
+        complete = total_bits // 64
+        self.output.write(words[:complete].astype('>u8').tobytes())
+        self.pending_bits = total_bits % 64
+        self.pending_word = words[complete] if self.pending_bits else np.uint64(0)
+
+    def flush(self):
+        if self.pending_bits:
+            pending = np.array([self.pending_word], dtype='>u8').tobytes()
+            self.output.write(pending[:(self.pending_bits + 7) // 8])
+        self.pending_word = np.uint64(0)
+        self.pending_bits = 0
+
+class DecodeTable:
+    """
+    Lookup-table decoder for canonical Huffman codes.
+
+    A peek of ``table_bits`` bits gives the symbol and code length directly
+    for all codes that are not longer than that; longer codes fall back to a
+    canonical first-code search. The sync index lets every group of
+    SYNC_INTERVAL symbols be decoded independently, so ``DECODE_LANES`` groups
+    advance together, one NumPy step per symbol.
+    """
+
+    def __init__(self, code_lengths, table_bits=TABLE_BITS):
+        self.max_length = max(code_lengths.values())
+        # Cover every code when that keeps the table cache-sized
+        if self.max_length <= MAX_TABLE_BITS:
+            table_bits = self.max_length
+        self.table_bits = min(table_bits, self.max_length)
+        dtype = np.uint8 if max(code_lengths) < 256 else np.uint16
+        self.symbols = np.zeros(1 << self.table_bits, dtype=dtype)
+        self.lengths = np.zeros(1 << self.table_bits, dtype=np.uint8)
+        fill_table(self.symbols, self.lengths, code_lengths, self.table_bits)
+
+        # First code, number of codes and offset into the sorted symbol list
+        # for every length, used by the slow path.
+        self.sorted_symbols = np.array(sorted(code_lengths, key=lambda char: (code_lengths[char], char)), dtype=dtype)
+        self.first_code = [0] * (self.max_length + 2)
+        self.code_count = [0] * (self.max_length + 2)
+        self.offset = [0] * (self.max_length + 2)
+        for length in code_lengths.values():
+            self.code_count[length] += 1
+        for length in range(1, self.max_length + 1):
+            self.first_code[length + 1] = (self.first_code[length] + self.code_count[length]) << 1
+            self.offset[length + 1] = self.offset[length] + self.code_count[length]
+
+    def __decode_long(self, payload, positions):
+        # Build a 64-bit window for each position from 9 payload bytes
+        byte_index = positions >> 3
+        window = np.zeros(len(positions), dtype=np.uint64)
+        for i in range(8):
+            window = (window << np.uint64(8)) | payload[byte_index + i].astype(np.uint64)
+        shift = (positions & 7).astype(np.uint64)
+        window = (window << shift) | (payload[byte_index + 8].astype(np.uint64) >> (np.uint64(8) - shift))
+
+        symbols = np.zeros(len(positions), dtype=self.sorted_symbols.dtype)
+        lengths = np.zeros(len(positions), dtype=np.int64)
+        pending = np.ones(len(positions), dtype=bool)
+        for length in range(self.table_bits + 1, self.max_length + 1):
+            code = (window >> np.uint64(64 - length)).astype(np.int64)
+            found = pending & (code - self.first_code[length] < self.code_count[length])
+            symbols[found] = self.sorted_symbols[self.offset[length] + code[found] - self.first_code[length]]
+            lengths[found] = length
+            pending &= ~found
+        if pending.any():
+            raise ValueError("Invalid Huffman code in payload")
+        return symbols, lengths
+
+    def lookup(self, peek, previous, payload, positions):
+        """Return the symbols and code lengths at ``positions`` given their peeked bits"""
+        symbols = self.symbols[peek]
+        lengths = self.lengths[peek]
+        long_codes = np.flatnonzero(lengths == 0)
+        if len(long_codes):
+            symbols[long_codes], lengths[long_codes] = self.__decode_long(payload, positions[long_codes])
+        return symbols, lengths
+
+    def decode(self, payload, sync_index, size):
+        """
+        Decode ``size`` symbols from a payload and its sync index.
+
+        Yields:
+            numpy.ndarray: Decoded symbols, in order, one batch of lanes at a time.
+        """
+        # Pad so every window read stays inside the buffer, including those of
+        # a last, partial group that keeps stepping past the end of the data
+        payload = np.frombuffer(payload + bytes(SYNC_INTERVAL * self.max_length // 8 + 16), dtype=np.uint8)
+        group_starts = np.concatenate(([0], np.cumsum(sync_index, dtype=np.int64)[:-1]))
+        peek_shift = 32 - self.table_bits
+        mask = (1 << self.table_bits) - 1
+
+        for first in range(0, len(group_starts), DECODE_LANES):
+            positions = group_starts[first:first + DECODE_LANES].copy()
+            count = min(len(positions) * SYNC_INTERVAL, size - first * SYNC_INTERVAL)
+            steps = min(SYNC_INTERVAL, count)
+            # Big-endian 32-bit words starting at every byte the lanes can touch
+            low = int(positions[0] >> 3)
+            chunk = payload[low:int(positions[-1] >> 3) + SYNC_INTERVAL * self.max_length // 8 + 8].astype(np.uint32)
+            words = (chunk[:-3] << 24) | (chunk[1:-2] << 16) | (chunk[2:-1] << 8) | chunk[3:]
+
+            decoded = np.empty((steps, len(positions)), dtype=self.symbols.dtype)
+            # Every sync group starts from context 0
+            symbols = np.zeros(len(positions), dtype=self.symbols.dtype)
+            for step in range(steps):
+                peek = (words[(positions >> 3) - low] >> (peek_shift - (positions & 7)).astype(np.uint32)) & mask
+                symbols, lengths = self.lookup(peek, symbols, payload, positions)
+                decoded[step] = symbols
+                positions += lengths
+            yield decoded.T.ravel()[:count]
+
+class ContextDecodeTable(DecodeTable):
+    """
+    Lookup-table decoder for context blocks.
+
+    Every context with its own code table gets a row of the lookup table;
+    the others share the row of the fallback table. The previous symbol of
+    each lane selects the row.
+    """
+
+    def __init__(self, fallback_lengths, context_lengths):
+        self.max_length = CONTEXT_MAX_CODE_LENGTH
+        self.table_bits = CONTEXT_MAX_CODE_LENGTH
+        size = 1 << self.table_bits
+        self.symbols = np.zeros(size * (len(context_lengths) + 1), dtype=np.uint8)
+        self.lengths = np.zeros(size * (len(context_lengths) + 1), dtype=np.uint8)
+        self.rows = np.zeros(256, dtype=np.int64)
+        fill_table(self.symbols[:size], self.lengths[:size], fallback_lengths, self.table_bits)
+        for row, context in enumerate(sorted(context_lengths), start=1):
+            self.rows[context] = row * size
+            fill_table(self.symbols[row * size:(row + 1) * size], self.lengths[row * size:(row + 1) * size],
+                       context_lengths[context], self.table_bits)
+
+    def lookup(self, peek, previous, payload, positions):
+        index = self.rows[previous] + peek
+        return self.symbols[index], self.lengths[index]
+
+def build_code_lengths(counter, max_code_length=None):
+    """
+    Compute Huffman code lengths from symbol counts.
+
+    Args:
+        counter (numpy.ndarray): Number of occurrences of every symbol; symbols
+            with a zero count get no code.
+        max_code_length (int, optional): Limit for the longest code.
+
+    Returns:
+        dict: Code length for every symbol that occurs.
+    """
+    pq = [BinaryTree(char, int(counter[char])) for char in np.flatnonzero(counter).tolist()]
+    heapq.heapify(pq)
+    while len(pq) > 1:
+        left = heapq.heappop(pq)
+        right = heapq.heappop(pq)
+        parent = BinaryTree(None, left.frequency + right.frequency, left, right)
+        heapq.heappush(pq, parent)
+
+    code_lengths = {}
+    stack = [(heapq.heappop(pq), 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node.char is not None:
+            # A tree with a single symbol still needs a one-bit code
+            code_lengths[node.char] = max(depth, 1)
+        else:
+            stack.append((node.left, depth + 1))
+            stack.append((node.right, depth + 1))
+
+    if max_code_length and max(code_lengths.values()) > max_code_length:
+        frequencies = {char: int(counter[char]) for char in code_lengths}
+        code_lengths = limited_code_lengths(frequencies, max_code_length)
+    return code_lengths
+
+def build_code_arrays(code_lengths):
+    """Return per-byte canonical code and code length arrays for encoding"""
+    if code_lengths and max(code_lengths.values()) > 64:
+        raise ValueError("Huffman code length exceeds 64 bits")
+    codes = np.zeros(256, dtype=np.uint64)
+    lengths = np.zeros(256, dtype=np.uint8)
+    for char, code in canonical_codes(code_lengths).items():
+        codes[char] = code
+        lengths[char] = code_lengths[char]
+    return codes, lengths
+
+def encode_symbols(symbols, codes, lengths, output, pairs=False):
+    """
+    Write the packed codes of ``symbols`` followed by their sync index.
+
+    With ``pairs``, byte symbols are encoded two at a time through a
+    65536-entry table when all codes fit in 32 bits, which halves the number
+    of codes the writer has to place.
+    """
+    if pairs and lengths.max() <= 32:
+        pair_lengths = (lengths[:, None].astype(np.uint64) + lengths[None, :]).ravel()
+        pair_codes = ((codes[:, None] << lengths[None, :].astype(np.uint64)) | codes[None, :]).ravel()
+    else:
+        pairs = False
+
+    writer = BitWriter(output)
+    sync_index = []
+    for start in range(0, len(symbols), ENCODE_CHUNK_SIZE):
+        chunk = symbols[start:start + ENCODE_CHUNK_SIZE]
+        sync_index.append(np.add.reduceat(lengths[chunk].astype(np.uint16),
+                                          np.arange(0, len(chunk), SYNC_INTERVAL)))
+        if pairs:
+            even = len(chunk) - len(chunk) % 2
+            writer.write(chunk[:even].view('>u2'), pair_codes, pair_lengths)
+            chunk = chunk[even:]
+        writer.write(chunk, codes, lengths)
+    writer.flush()
+    if sync_index:
+        output.write(np.concatenate(sync_index).astype('>u2').tobytes())
+
 class HuffmanCoding:
-    def __init__(self, path):
+    def __init__(self, path, max_code_length=None, block_size=BLOCK_SIZE, workers=None, context_order=0):
         self.path = path
-        self.root = None
-
-    def __frequency_of_chars(self, text):
-        freq_dict = {}
-        for char in text:
-            freq_dict[char] = freq_dict.get(char, 0) + 1
-        return freq_dict
-
-    def __build_tree(self, text):
-        counter = self.__frequency_of_chars(text)
-        pq = [BinaryTree(char, counter[char]) for char in counter]
-        heapq.heapify(pq)
-        while len(pq) > 1:
-            left = heapq.heappop(pq)
-            right = heapq.heappop(pq)
-            parent = BinaryTree(None, left.frequency + right.frequency, left, right)
-            heapq.heappush(pq, parent)
-        return heapq.heappop(pq)
-
-    def __build_map(self, root):
-        def dfs(root, code, encoding_map):
-            if root.char:
-                encoding_map[root.char] = "".join(code)
-            else:
-                code.append('0')
-                dfs(root.left, code, encoding_map)
-                code.pop()
-                code.append('1')
-                dfs(root.right, code, encoding_map)
-                code.pop()
-        encoding_map = {}
-        dfs(root, [], encoding_map)
-        return encoding_map
-
-    def __encode(self, text):
-        self.root = self.__build_tree(text)
-        encoding_map = self.__build_map(self.root)
-        return ''.join([encoding_map[char] for char in text])
-
-    def __decode(self, encoded, root):
-        if root.char:
-            return root.char * len(encoded)
-        decoded = []
-        node = root
-        for bit in encoded:
-            if bit == '0':
-                node = node.left
+        self.max_code_length = max_code_length
+        self.block_size = block_size
+        # 1 lets blocks code each byte with a table for the byte before it
+        self.context_order = context_order
+        # Number of processes used for blocks; None or 1 runs in-process
+        self.workers = workers
+        self.code_lengths = None
+        # Longest code written in any block so far; code_lengths only holds
+        # the table of the last block
+        self.longest_code = 0
+
+    def __frequency_of_chars(self, data):
+        return np.bincount(data, minlength=256)
+
+    def __build_context_tables(self, data):
+        # Previous byte of every symbol; each sync group starts from context 0
+        contexts = np.zeros(len(data), dtype=np.int64)
+        contexts[1:] = data[:-1]
+        contexts[::SYNC_INTERVAL] = 0
+        pair_counts = np.bincount(contexts * 256 + data, minlength=1 << 16).reshape(256, 256)
+        # The decode tables are sized for CONTEXT_MAX_CODE_LENGTH; a tighter
+        # limit from the caller still applies
+        max_code_length = min(self.max_code_length or CONTEXT_MAX_CODE_LENGTH, CONTEXT_MAX_CODE_LENGTH)
+
+        fallback = build_code_lengths(pair_counts.sum(axis=0), max_code_length)
+        _, fallback_lengths = build_code_arrays(fallback)
+        fallback_lengths = fallback_lengths.astype(np.int64)
+        # Header, fallback table and context bitmap
+        total_bits = 8 * (9 + packed_table_size(fallback) + 32)
+        tables = {}
+        for context in np.flatnonzero(pair_counts.sum(axis=1)).tolist():
+            counts = pair_counts[context]
+            shared_bits = int(np.dot(counts, fallback_lengths))
+            # Sparse contexts are pruned: they keep the fallback table unless
+            # their own table pays for its storage
+            own = build_code_lengths(counts, max_code_length)
+            own_bits = 8 * packed_table_size(own) + sum(int(counts[char]) * length for char, length in own.items())
+            if own_bits < shared_bits:
+                tables[context] = own
+                total_bits += own_bits
             else:
-                node = node.right
-            if node.char:
-                decoded.append(node.char)
-                node = root
-        return ''.join(decoded)
-
-    def __build_padded_text(self, encodedText):
-        paddingValue = 8 - len(encodedText) % 8
-        for i in range(paddingValue):
-            encodedText += '0'
-        paddedInfo = '{0:08b}'.format(paddingValue)
-        paddedText = paddedInfo + encodedText
-        return paddedText
-
-    def __build_byte_array(self, paddedText):
-        array = []
-        for i in range(0, len(paddedText), 8):
-            byte = paddedText[i:i + 8]
-            array.append(int(byte, 2))
-        return array
-
-    def compress(self):
+                total_bits += shared_bits
+        return contexts, fallback, tables, (total_bits + 7) // 8
+
+    def __encode_context_block(self, data, contexts, fallback, tables, output):
+        # Layout after the block type and size: fallback table, a 32-byte
+        # bitmap of the contexts with their own table, those tables in
+        # ascending context order (all in pack_table form), the payload
+        # length (8 bytes), the payload and the sync index.
+        codes = np.zeros(1 << 16, dtype=np.uint64)
+        lengths = np.zeros(1 << 16, dtype=np.uint8)
+        bitmap = np.zeros(256, dtype=np.uint8)
+        for context in np.unique(contexts).tolist():
+            code_lengths = tables.get(context, fallback)
+            row_codes, row_lengths = build_code_arrays(code_lengths)
+            codes[context << 8:(context + 1) << 8] = row_codes
+            lengths[context << 8:(context + 1) << 8] = row_lengths
+        bitmap[list(tables)] = 1
+
+        symbols = (contexts << 8) | data
+        payload_size = (int(lengths[symbols].sum(dtype=np.int64)) + 7) // 8
+        output.write(bytes([BLOCK_CONTEXT]) + len(data).to_bytes(8, byteorder='big'))
+        output.write(pack_table(fallback))
+        output.write(np.packbits(bitmap).tobytes())
+        for context in sorted(tables):
+            output.write(pack_table(tables[context]))
+        output.write(payload_size.to_bytes(8, byteorder='big'))
+
+        encode_symbols(symbols, codes, lengths, output)
+
+    def encode_block(self, data, output):
+        """Write ``data`` (a uint8 array) to ``output`` as one block"""
+        counter = self.__frequency_of_chars(data)
+        self.code_lengths = build_code_lengths(counter, self.max_code_length)
+        codes, lengths = build_code_arrays(self.code_lengths)
+
+        header = self.__build_header(self.code_lengths, len(data))
+        payload_size = (int(np.dot(counter, lengths.astype(np.int64))) + 7) // 8
+        sync_size = 2 * -(-len(data) // SYNC_INTERVAL)
+        block_size = len(header) + 8 + payload_size + sync_size
+
+        if self.context_order == 1:
+            contexts, fallback, tables, context_size = self.__build_context_tables(data)
+            if context_size + sync_size < min(block_size, len(data)):
+                self.__encode_context_block(data, contexts, fallback, tables, output)
+                for code_lengths in [fallback, *tables.values()]:
+                    self.longest_code = max(self.longest_code, max(code_lengths.values()))
+                return
+
+        if block_size >= len(data):
+            # Incompressible block; keep the bytes as they are
+            output.write(bytes([BLOCK_STORED]) + len(data).to_bytes(8, byteorder='big'))
+            output.write(data.tobytes())
+            return
+
+        self.longest_code = max(self.longest_code, max(self.code_lengths.values()))
+        output.write(header)
+        output.write(payload_size.to_bytes(8, byteorder='big'))
+        encode_symbols(data, codes, lengths, output, pairs=True)
+
+    def __build_header(self, code_lengths, size):
+        header = bytearray([BLOCK_HUFFMAN])
+        header += size.to_bytes(8, byteorder='big')
+        header += len(code_lengths).to_bytes(2, byteorder='big')
+        for char in sorted(code_lengths):
+            header.append(char)
+            header.append(code_lengths[char])
+        return bytes(header)
+
+    def __read_exactly(self, file, size):
+        # Read in pieces, so memory grows with the data actually present
+        pieces = []
+        while size > 0:
+            piece = file.read(min(size, READ_SIZE))
+            if not piece:
+                raise ValueError("Truncated Huffman compressed file")
+            pieces.append(piece)
+            size -= len(piece)
+        return pieces[0] if len(pieces) == 1 else b''.join(pieces)
+
+    def __read_packed_table(self, file):
+        count = self.__read_exactly(file, 1)[0] + 1
+        chars = self.__read_exactly(file, count)
+        packed = self.__read_exactly(file, (count + 1) // 2)
+        return {char: (packed[i // 2] >> (4 if i % 2 == 0 else 0)) & 0x0F for i, char in enumerate(chars)}
+
+    def decode_block(self, file, output):
+        """Decode the next block to ``output``; returns False after the last one"""
+        block_type = self.__read_exactly(file, 1)[0]
+        if block_type == BLOCK_END:
+            return False
+        size = int.from_bytes(self.__read_exactly(file, 8), byteorder='big')
+        if block_type == BLOCK_STORED:
+            # Copied through in pieces; the block can be as large as the input
+            while size > 0:
+                piece = self.__read_exactly(file, min(size, READ_SIZE))
+                output.write(piece)
+                size -= len(piece)
+            return True
+        if block_type == BLOCK_HUFFMAN:
+            # Read the code-length table and rebuild the canonical codes
+            count = int.from_bytes(self.__read_exactly(file, 2), byteorder='big')
+            table = self.__read_exactly(file, 2 * count)
+            self.code_lengths = {table[i]: table[i + 1] for i in range(0, len(table), 2)}
+            decode_table = DecodeTable(self.code_lengths)
+        elif block_type == BLOCK_CONTEXT:
+            self.code_lengths = self.__read_packed_table(file)
+            bitmap = np.unpackbits(np.frombuffer(self.__read_exactly(file, 32), dtype=np.uint8))
+            context_lengths = {context: self.__read_packed_table(file) for context in np.flatnonzero(bitmap).tolist()}
+            decode_table = ContextDecodeTable(self.code_lengths, context_lengths)
+        else:
+            raise ValueError(f"Unknown Huffman block type: {block_type}")
+
+        payload_size = int.from_bytes(self.__read_exactly(file, 8), byteorder='big')
+        # Every code takes at least one bit
+        if size > 8 * payload_size:
+            raise ValueError("Invalid Huffman block: more symbols than payload bits")
+        payload = self.__read_exactly(file, payload_size)
+        sync_index = np.frombuffer(self.__read_exactly(file, 2 * -(-size // SYNC_INTERVAL)), dtype='>u2')
+
+        for symbols in decode_table.decode(payload, sync_index, size):
+            output.write(symbols.tobytes())
+        return True
+
+    def __read_blocks(self, file):
+        # Only one block of input is held in memory at a time per job
+        block_size = self.block_size or -1
+        block = file.read(block_size)
+        while block:
+            yield block
+            block = file.read(block_size)
+
+    def __write_index(self, output, index):
+        for offset, size in index:
+            output.write(offset.to_bytes(8, byteorder='big'))
+            output.write(size.to_bytes(8, byteorder='big'))
+        output.write(len(index).to_bytes(8, byteorder='big'))
+        output.write(INDEX_MAGIC)
+
+    def read_index(self, file):
+        """
+        Read the block index of a compressed file.
+
+        Returns:
+            list: (file offset, input size) of every block, or None if the
+                file has no readable index.
+        """
+        file.seek(0, os.SEEK_END)
+        end = file.tell()
+        if end < len(MAGIC) + 12:
+            return None
+        file.seek(end - 12)
+        footer = file.read(12)
+        count = int.from_bytes(footer[:8], byteorder='big')
+        if footer[8:] != INDEX_MAGIC or 16 * count + 12 > end - len(MAGIC):
+            return None
+        file.seek(end - 12 - 16 * count)
+        entries = file.read(16 * count)
+        return [(int.from_bytes(entries[i:i + 8], byteorder='big'), int.from_bytes(entries[i + 8:i + 16], byteorder='big'))
+                for i in range(0, len(entries), 16)]
+
+    def compress_stream(self, input_file, output):
+        """
+        Compress between binary file objects.
+
+        Args:
+            input_file: Readable file object with the data to compress.
+            output: Writable file object; it does not need to be seekable.
+
+        Returns:
+            int: Number of compressed bytes written.
+        """
+        return self.__compress_blocks(self.__read_blocks(input_file), output)
+
+    def compress_to(self, output):
+        """
+        Compress the file at ``self.path`` to a binary file object.
+
+        Blocks are slices of the memory-mapped file rather than copies.
+
+        Returns:
+            int: Number of compressed bytes written.
+        """
+        with MappedInput(self.path) as source:
+            return self.__compress_blocks(source.chunks(self.block_size), output)
+
+    def __compress_blocks(self, blocks, output):
+        output.write(MAGIC)
+        # Block offsets are counted here so the output need not support tell()
+        position = len(MAGIC)
+        index = []
+        if self.workers and self.workers > 1:
+            # Blocks are independent, so they are encoded concurrently and
+            # written back in order
+            with ProcessPoolExecutor(self.workers) as executor:
+                arguments = ((bytes(block), self.max_code_length, self.context_order) for block in blocks)
+                encoded_blocks = ordered_results(executor, _compress_block, arguments, 2 * self.workers)
+                for size, encoded in encoded_blocks:
+                    index.append((position, size))
+                    output.write(encoded)
+                    position += len(encoded)
+        else:
+            for block in blocks:
+                encoded = io.BytesIO()
+                self.encode_block(np.frombuffer(block, dtype=np.uint8), encoded)
+                index.append((position, len(block)))
+                output.write(encoded.getbuffer())
+                position += encoded.tell()
+        output.write(bytes([BLOCK_END]))
+        position += 1
+        self.__write_index(output, index)
+        return position + 16 * len(index) + 12
+
+    def decompress_stream(self, input_file, output):
+        """
+        Decompress between binary file objects.
+
+        The input is read sequentially unless several workers are used,
+        which needs a seekable input to read the block index.
+        """
+        magic = input_file.read(len(MAGIC))
+        if magic == ADAPTIVE_MAGIC:
+            decoder = AdaptiveHuffmanDecoder()
+            output.write(decoder.feed(magic))
+            for chunk in iter(lambda: input_file.read(ADAPTIVE_SEGMENT_SIZE), b''):
+                output.write(decoder.feed(chunk))
+            output.write(decoder.flush())
+            return
+        if magic != MAGIC:
+            raise ValueError("Not a Huffman compressed file")
+        index = None
+        if self.workers and self.workers > 1 and input_file.seekable():
+            index = self.read_index(input_file)
+            if index is None:
+                input_file.seek(len(MAGIC))
+        if index is not None:
+            with ProcessPoolExecutor(self.workers) as executor:
+                for decoded in ordered_results(executor, _decompress_block, self.__read_indexed_blocks(input_file, index), 2 * self.workers):
+                    output.write(decoded)
+        else:
+            while self.decode_block(input_file, output):
+                pass
+
+    def __read_indexed_blocks(self, file, index):
+        # Each block ends where the next starts; the last ends at the end
+        # marker in front of the index
+        file.seek(0, os.SEEK_END)
+        index_start = file.tell() - 12 - 16 * len(index)
+        ends = [offset for offset, _ in index[1:]] + [index_start - 1]
+        for (offset, _), end in zip(index, ends):
+            file.seek(offset)
+            yield (self.__read_exactly(file, end - offset),)
+
+    def compress_bytes(self, data):
+        """Compress a bytes-like object in memory; returns the archive as bytes"""
+        output = io.BytesIO()
+        self.compress_stream(io.BytesIO(data), output)
+        return output.getvalue()
+
+    def decompress_bytes(self, data):
+        """Decompress an archive held in a bytes-like object; returns bytes"""
+        output = io.BytesIO()
+        self.decompress_stream(io.BytesIO(data), output)
+        return output.getvalue()
+
+    def compress(self, output_path='compressed_file.bin'):
         print("Compression processing")
-        outputPath = 'compressed_file.bin'
-        with open(self.path, 'r+') as file, open(outputPath, 'wb') as output:
-            text = file.read().rstrip()
-            encodedText = self.__encode(text)
-            paddedText = self.__build_padded_text(encodedText)
-            bytesArray = self.__build_byte_array(paddedText)
-            finalBytes = bytes(bytesArray)
-            
-            # Serialize the tree structure
-            tree_bytes = pickle.dumps(self.root)
-            tree_size = len(tree_bytes)
-            
-            # Write tree size as 4 bytes, followed by tree data and compressed data
-            output.write(tree_size.to_bytes(4, byteorder='big'))
-            output.write(tree_bytes)
-            output.write(finalBytes)
+        with open(output_path, 'wb') as output:
+            self.compress_to(output)
             
         print('Compressed successfully')
-        return outputPath
-
-    def __remove_padding_from_text(self, text):
-        padded_info = text[:8]
-        padding_value = int(padded_info, 2)
-        text = text[8:]
-        text = text[:-1 * padding_value]
-        return text
-
-    def decompress(self, input_path):
-        output_path = 'decompressed_file.txt'
-        with open(input_path, 'rb') as file, open(output_path, 'w') as output:
-            # Read tree size (first 4 bytes)
-            tree_size_bytes = file.read(4)
-            tree_size = int.from_bytes(tree_size_bytes, byteorder='big')
-            
-            # Read and load the tree structure
-            tree_bytes = file.read(tree_size)
-            self.root = pickle.loads(tree_bytes)
-            
-            # Read compressed data
-            bit_string = ''
-            byte = file.read(1)
-            while byte:
-                byte = ord(byte)  # convert to integer
-                bits = bin(byte)[2:].rjust(8, '0')  # convert to binary string
-                bit_string += bits
-                byte = file.read(1)
-            text = self.__remove_padding_from_text(bit_string)
-            
-            actual_text = self.__decode(text, self.root)
-            output.write(actual_text)
+        return output_path
+
+    def decompress(self, input_path, output_path='decompressed_file.txt'):
+        with open(input_path, 'rb') as file, open(output_path, 'wb') as output:
+            self.decompress_stream(file, output)
         print('Decompressed successfully')
         return output_path
+
+class AdaptiveModel:
+    """Symbol counts and the code built from them, shared by both stream ends"""
+
+    def __init__(self):
+        # Every byte starts with a count of one, so any byte can be coded
+        self.counts = np.ones(256, dtype=np.int64)
+        self.code_lengths = build_code_lengths(self.counts, ADAPTIVE_MAX_CODE_LENGTH)
+
+    def update(self, symbols):
+        self.counts += np.bincount(symbols, minlength=256)
+        if self.counts.sum() > ADAPTIVE_RESCALE_LIMIT:
+            self.counts = (self.counts + 1) // 2
+        self.code_lengths = build_code_lengths(self.counts, ADAPTIVE_MAX_CODE_LENGTH)
+
+class AdaptiveHuffmanEncoder:
+    """
+    One-pass Huffman encoder for streams of unknown length.
+
+    Input is coded in frames of ``segment_size`` bytes with a code built from
+    the counts of all earlier frames, so each frame can be written as soon as
+    it is complete. ``feed`` returns the compressed bytes that are ready.
+    """
+
+    def __init__(self, segment_size=ADAPTIVE_SEGMENT_SIZE):
+        self.segment_size = segment_size
+        self.model = AdaptiveModel()
+        self.pending = bytearray()
+        self.started = False
+        self.finished = False
+
+    def __write_frame(self, segment, output):
+        data = np.frombuffer(bytes(segment), dtype=np.uint8)
+        codes, lengths = build_code_arrays(self.model.code_lengths)
+        payload = io.BytesIO()
+        encode_symbols(data, codes, lengths, payload, pairs=True)
+        payload_size = (int(lengths[data].sum(dtype=np.int64)) + 7) // 8
+        output.write(len(data).to_bytes(4, byteorder='big'))
+        output.write(payload_size.to_bytes(4, byteorder='big'))
+        output.write(payload.getvalue())
+        self.model.update(data)
+
+    def __start(self, output):
+        if self.finished:
+            raise ValueError("Adaptive Huffman stream already finished")
+        if not self.started:
+            output.write(ADAPTIVE_MAGIC)
+            self.started = True
+
+    def feed(self, chunk):
+        """Add ``chunk`` to the stream; returns the compressed bytes ready so far"""
+        output = io.BytesIO()
+        self.__start(output)
+        self.pending += chunk
+        consumed = 0
+        while len(self.pending) - consumed >= self.segment_size:
+            self.__write_frame(self.pending[consumed:consumed + self.segment_size], output)
+            consumed += self.segment_size
+        del self.pending[:consumed]
+        return output.getvalue()
+
+    def flush(self, finish=True):
+        """
+        Code any buffered input as a short frame.
+
+        Args:
+            finish (bool): Also end the stream. With False the stream stays
+                open, which bounds latency for slow producers.
+
+        Returns:
+            bytes: The remaining compressed bytes.
+        """
+        output = io.BytesIO()
+        self.__start(output)
+        if self.pending:
+            self.__write_frame(self.pending, output)
+            self.pending = bytearray()
+        if finish:
+            output.write(bytes(4))
+            self.finished = True
+        return output.getvalue()
+
+class AdaptiveHuffmanDecoder:
+    """Decoder for streams written by AdaptiveHuffmanEncoder; accepts input in any chunking"""
+
+    def __init__(self):
+        self.model = AdaptiveModel()
+        self.buffer = bytearray()
+        self.started = False
+        self.eof = False
+
+    def feed(self, chunk):
+        """Add compressed bytes; returns the bytes of every frame now complete"""
+        if self.eof:
+            raise ValueError("Data after the end of the adaptive Huffman stream")
+        self.buffer += chunk
+        if not self.started:
+            if len(self.buffer) < len(ADAPTIVE_MAGIC):
+                return b''
+            if self.buffer[:len(ADAPTIVE_MAGIC)] != ADAPTIVE_MAGIC:
+                raise ValueError("Not an adaptive Huffman stream")
+            del self.buffer[:len(ADAPTIVE_MAGIC)]
+            self.started = True
+
+        decoded = []
+        while not self.eof and len(self.buffer) >= 4:
+            count = int.from_bytes(self.buffer[:4], byteorder='big')
+            if count == 0:
+                self.eof = True
+                if len(self.buffer) > 4:
+                    raise ValueError("Data after the end of the adaptive Huffman stream")
+                break
+            if len(self.buffer) < 8:
+                break
+            payload_size = int.from_bytes(self.buffer[4:8], byteorder='big')
+            frame_end = 8 + payload_size + 2 * -(-count // SYNC_INTERVAL)
+            if len(self.buffer) < frame_end:
+                break
+            payload = bytes(self.buffer[8:8 + payload_size])
+            sync_index = np.frombuffer(bytes(self.buffer[8 + payload_size:frame_end]), dtype='>u2')
+            del self.buffer[:frame_end]
+
+            symbols = np.concatenate(list(DecodeTable(self.model.code_lengths).decode(payload, sync_index, count)))
+            self.model.update(symbols)
+            decoded.append(symbols.tobytes())
+        return b''.join(decoded)
+
+    def flush(self):
+        """Check that the stream ended; returns any remaining output"""
+        if not self.eof:
+            raise ValueError("Truncated adaptive Huffman stream")
+        return b''
+
+def compress_adaptive(input_file, output_file, segment_size=ADAPTIVE_SEGMENT_SIZE):
+    """
+    Compress a binary file object to another in one pass.
+
+    Reads with ``read1`` where available, so data from pipes is coded as it
+    arrives instead of after the producer closes the stream.
+    """
+    encoder = AdaptiveHuffmanEncoder(segment_size)
+    read = getattr(input_file, 'read1', input_file.read)
+    chunk = read(segment_size)
+    while chunk:
+        output_file.write(encoder.feed(chunk))
+        chunk = read(segment_size)
+    output_file.write(encoder.flush())
+
+def decompress_adaptive(input_file, output_file, chunk_size=ADAPTIVE_SEGMENT_SIZE):
+    """Decompress an adaptive Huffman stream between binary file objects"""
+    decoder = AdaptiveHuffmanDecoder()
+    read = getattr(input_file, 'read1', input_file.read)
+    chunk = read(chunk_size)
+    while chunk:
+        output_file.write(decoder.feed(chunk))
+        chunk = read(chunk_size)
+    output_file.write(decoder.flush())
@@ -1,65 +1,467 @@
-import pickle
-
-DICTIONARY_SIZE = 256
-
-def lzw_compress(input_data):
-    global DICTIONARY_SIZE
-    dictionary = {bytes([i]): i for i in range(DICTIONARY_SIZE)}
-    result = []
-    temp = b""
-
-    for byte in input_data:
-        temp2 = temp + bytes([byte])
-        if temp2 in dictionary:
-            temp = temp2
-        else:
-            result.append(dictionary[temp])
-            dictionary[temp2] = DICTIONARY_SIZE
-            DICTIONARY_SIZE += 1
-            temp = bytes([byte])
-
-    if temp:
-        result.append(dictionary[temp])
-        
-    return result
-
-def lzw_decompress(input_data):
-    global DICTIONARY_SIZE
-    dictionary = {i: bytes([i]) for i in range(DICTIONARY_SIZE)}
-    result = bytearray()
-
-    previous = bytes([input_data[0]])
-    result.extend(previous)
-    input_data = input_data[1:]
-
-    for code in input_data:
-        if code in dictionary:
-            entry = dictionary[code]
-        else:
-            entry = previous + previous[:1]
-        result.extend(entry)
-        dictionary[DICTIONARY_SIZE] = previous + entry[:1]
-        DICTIONARY_SIZE += 1
-        previous = entry
-    
-    return result
-
-def write_compressed_file(path, compressed_data):
-    with open(path, 'wb') as output:
-        pickle.dump(compressed_data, output)
-
-def read_compressed_file(path):
-    with open(path, 'rb') as input:
-        return pickle.load(input)
-
-def compress_file(input_path, output_path):
-    with open(input_path, 'rb') as file:
-        input_data = file.read()
-    compressed_data = lzw_compress(input_data)
-    write_compressed_file(output_path, compressed_data)
-
-def decompress_file(input_path, output_path):
-    compressed_data = read_compressed_file(input_path)
-    decompressed_data = lzw_decompress(compressed_data)
-    with open(output_path, 'wb') as output:
-        output.write(decompressed_data)
+from array import array
+
+import numpy as np
+
+from compression.mapped_input import MappedInput
+
+# Compressed file layout: MAGIC, the maximum code width (1 byte), then
+# packets of a code count (8 bytes, big-endian) and the codes packed MSB
+# first, ended by a count of zero.  A packet that ends with CLEAR_CODE is
+# followed by an empty dictionary.  Each code is written with just enough
+# bits for the largest code the dictionary could hold at that point, from 9
+# bits up to the maximum width, counting from the last clear code.
+MAGIC = b'LZW\x03'
+
+# Codes 0-255 stand for single bytes
+LITERAL_CODES = 256
+
+# Reserved for resetting the dictionary; never assigned to a string
+CLEAR_CODE = 256
+FIRST_CODE = 257
+
+MIN_BITS = 9
+MAX_BITS = 16
+
+# Once the dictionary is full, the compression ratio is checked after every
+# this many input bytes; the dictionary is cleared when it stops improving
+CHECK_INTERVAL = 10000
+
+# Input bytes after which a dictionary that has not filled up is cleared.
+# Entries point into the decoder's output since the last clear, so this
+# bounds the output the decoder has to keep.
+HISTORY_LIMIT = 1 << 24
+
+# Codes buffered by the encoder before a packet is written
+PACKET_CODES = 1 << 16
+
+# Bytes read per step by compress_file and decompress_file
+CHUNK_SIZE = 1 << 20
+
+def code_widths(count, max_bits=MAX_BITS, start=0):
+    """
+    Bit width of ``count`` codes starting ``start`` codes after a clear.
+
+    Before code i is written the dictionary holds at most i new strings, so
+    the largest possible value is FIRST_CODE + i - 1. Encoder and decoder
+    both derive the widths from the code position alone.
+    """
+    largest = FIRST_CODE - 1 + start + np.arange(count, dtype=np.int64)
+    widths = np.floor(np.log2(np.maximum(largest, 1))).astype(np.int64) + 1
+    return np.clip(widths, MIN_BITS, max_bits)
+
+def pack_codes(codes, max_bits=MAX_BITS, start=0):
+    """Pack codes MSB first with variable widths; returns a bytearray"""
+    codes = np.asarray(codes, dtype=np.uint16)
+    widths = code_widths(len(codes), max_bits, start)
+    # Expand every code to 16 bits and keep only its low ``width`` bits
+    bits = np.unpackbits(codes.astype('>u2').view(np.uint8).reshape(-1, 2), axis=1)
+    keep = np.arange(16) >= (16 - widths)[:, None]
+    return bytearray(np.packbits(bits[keep]).tobytes())
+
+def packed_size(count, max_bits=MAX_BITS, start=0):
+    """Number of bytes taken by ``count`` packed codes"""
+    return (int(code_widths(count, max_bits, start).sum()) + 7) // 8
+
+def unpack_codes(data, count, max_bits=MAX_BITS, start=0):
+    """Read ``count`` variable-width codes from ``data`` in bulk"""
+    widths = code_widths(count, max_bits, start)
+    ends = np.cumsum(widths)
+    if count and (int(ends[-1]) + 7) // 8 > len(data):
+        raise ValueError("Truncated LZW code stream")
+    starts = ends - widths
+    # A code spans at most three bytes; read each as a 24-bit window
+    padded = np.frombuffer(bytes(data) + bytes(3), dtype=np.uint8).astype(np.uint32)
+    byte_positions = starts >> 3
+    windows = (padded[byte_positions] << 16) | (padded[byte_positions + 1] << 8) | padded[byte_positions + 2]
+    shifts = (24 - (starts & 7) - widths).astype(np.uint32)
+    masks = ((1 << widths) - 1).astype(np.uint32)
+    return ((windows >> shifts) & masks).tolist()
+
+def check_max_bits(max_bits):
+    if not MIN_BITS <= max_bits <= MAX_BITS:
+        raise ValueError(f"max_bits must be between {MIN_BITS} and {MAX_BITS}")
+
+class LZWEncoder:
+    """
+    Incremental LZW compressor.
+
+    ``feed`` takes input in chunks of any size and returns the compressed
+    bytes that are ready; ``flush`` ends the stream. Memory stays bounded by
+    the dictionary and one packet of codes, whatever the input length, and
+    the output does not depend on how the input was split.
+    """
+
+    def __init__(self, max_bits=MAX_BITS, reset=True):
+        check_max_bits(max_bits)
+        self.max_bits = max_bits
+        # False keeps a full dictionary for the rest of the input
+        self.reset = reset
+        # Strings are keyed on (prefix code << 8) | next byte, so each step is
+        # one integer lookup and no byte strings are built
+        self.dictionary = {}
+        self.next_code = FIRST_CODE
+        # Code of the match in progress; None at the start of a segment
+        self.code = None
+        self.until_check = CHECK_INTERVAL
+        self.segment_input = 0
+        self.segment_codes = 0
+        self.best_ratio = 0.0
+        self.pending = []
+        # Codes written since the last clear, which sets the next code width
+        self.position = 0
+        self.started = False
+        self.finished = False
+
+    def __encode_run(self, view, result):
+        # Encode bytes up to the next ratio check
+        dictionary = self.dictionary
+        get = dictionary.get
+        next_code = self.next_code
+        limit = 1 << self.max_bits
+        append = result.append
+        code = self.code
+        if code is None:
+            code = view[0]
+            view = view[1:]
+
+        for byte in view:
+            key = (code << 8) | byte
+            found = get(key)
+            if found is not None:
+                code = found
+            else:
+                append(code)
+                if next_code < limit:
+                    dictionary[key] = next_code
+                    next_code += 1
+                code = byte
+
+        self.code = code
+        self.next_code = next_code
+
+    def __check(self, result):
+        # Start a new dictionary when a full one stops paying off, as Unix
+        # compress does, or when one is still filling after HISTORY_LIMIT
+        if self.next_code == 1 << self.max_bits:
+            if not self.reset:
+                return
+            # Every code is max_bits wide by now, so codes measure output
+            ratio = self.segment_input / (self.segment_codes + 1)
+            if ratio > self.best_ratio:
+                self.best_ratio = ratio
+                return
+        elif self.segment_input < HISTORY_LIMIT:
+            return
+        result.append(self.code)
+        result.append(CLEAR_CODE)
+        self.dictionary.clear()
+        self.next_code = FIRST_CODE
+        self.code = None
+        self.segment_input = 0
+        self.segment_codes = 0
+        self.best_ratio = 0.0
+
+    def encode(self, chunk):
+        """Returns the codes completed by ``chunk``, clear codes included"""
+        view = memoryview(chunk).cast('B')
+        result = []
+        while len(view):
+            run = view[:self.until_check]
+            view = view[len(run):]
+            before = len(result)
+            self.__encode_run(run, result)
+            self.segment_input += len(run)
+            self.segment_codes += len(result) - before
+            self.until_check -= len(run)
+            if self.until_check == 0:
+                self.until_check = CHECK_INTERVAL
+                self.__check(result)
+        return result
+
+    def finish(self):
+        """Returns the code of the match still in progress"""
+        if self.code is None:
+            return []
+        codes = [self.code]
+        self.code = None
+        return codes
+
+    def __packets(self, final):
+        # A packet ends at every clear code, since widths restart after it,
+        # and otherwise after PACKET_CODES codes
+        output = []
+        pending = self.pending
+        start = 0
+        while start < len(pending):
+            try:
+                end = pending.index(CLEAR_CODE, start, start + PACKET_CODES) + 1
+            except ValueError:
+                if len(pending) - start >= PACKET_CODES:
+                    end = start + PACKET_CODES
+                elif final:
+                    end = len(pending)
+                else:
+                    break
+            output.append((end - start).to_bytes(8, byteorder='big'))
+            output.append(pack_codes(pending[start:end], self.max_bits, self.position))
+            self.position = 0 if pending[end - 1] == CLEAR_CODE else self.position + end - start
+            start = end
+        del pending[:start]
+        return output
+
+    def __start(self):
+        if self.finished:
+            raise ValueError("LZW stream already finished")
+        if self.started:
+            return []
+        self.started = True
+        return [MAGIC, bytes([self.max_bits])]
+
+    def feed(self, chunk):
+        """Add ``chunk`` to the stream; returns the compressed bytes ready so far"""
+        output = self.__start()
+        self.pending += self.encode(chunk)
+        output += self.__packets(final=False)
+        return b''.join(output)
+
+    def flush(self):
+        """End the stream; returns the remaining compressed bytes"""
+        output = self.__start()
+        self.pending += self.finish()
+        output += self.__packets(final=True)
+        output.append(bytes(8))
+        self.finished = True
+        return b''.join(output)
+
+class LZWDecoder:
+    """
+    Incremental LZW decompressor.
+
+    ``feed`` accepts compressed bytes split anywhere and returns the data
+    decoded so far. A dictionary string is always a copy of earlier output:
+    the string added after a code is the previous string plus the byte that
+    follows it. Entries are kept as an (offset, length) pair into the output
+    since the last clear code, in preallocated arrays, and decoded with one
+    slice copy. Once the dictionary is full no more entries are added, so
+    only the output up to that point is kept.
+    """
+
+    def __init__(self, max_bits=None):
+        # Read from the stream header unless decoding bare codes
+        self.max_bits = None
+        self.buffer = bytearray()
+        self.position = 0
+        self.eof = False
+        if max_bits is not None:
+            self.__start(max_bits)
+
+    def __start(self, max_bits):
+        check_max_bits(max_bits)
+        self.max_bits = max_bits
+        self.offsets = array('Q', [0]) * (1 << max_bits)
+        self.lengths = array('I', [1]) * (1 << max_bits)
+        self.history = bytearray()
+        self.next_code = FIRST_CODE
+        self.previous_offset = 0
+        # Zero before the first code of a segment
+        self.previous_length = 0
+
+    def decode(self, codes):
+        """Returns the bytes encoded by ``codes``, which continue the codes decoded before"""
+        history = self.history
+        offsets = self.offsets
+        lengths = self.lengths
+        next_code = self.next_code
+        limit = 1 << self.max_bits
+        previous_offset = self.previous_offset
+        previous_length = self.previous_length
+        output = bytearray()
+        # History from here on has not been copied to the output yet
+        mark = len(history)
+
+        for code in codes:
+            if next_code < limit:
+                position = len(history)
+                if code < LITERAL_CODES:
+                    history.append(code)
+                    length = 1
+                elif code == CLEAR_CODE:
+                    output += history[mark:]
+                    history = bytearray()
+                    mark = 0
+                    next_code = FIRST_CODE
+                    previous_length = 0
+                    continue
+                elif code < next_code:
+                    length = lengths[code]
+                    offset = offsets[code]
+                    history += history[offset:offset + length]
+                elif code == next_code and previous_length:
+                    # The string being defined: previous string plus its first byte
+                    length = previous_length + 1
+                    history += history[previous_offset:position]
+                    history.append(history[previous_offset])
+                else:
+                    raise ValueError(f"Invalid LZW code: {code}")
+                if previous_length:
+                    offsets[next_code] = previous_offset
+                    lengths[next_code] = previous_length + 1
+                    next_code += 1
+                    if next_code == limit:
+                        output += history[mark:]
+                        mark = len(history)
+                previous_offset = position
+                previous_length = length
+            # The dictionary is full: entries only point into the history
+            elif code < LITERAL_CODES:
+                output.append(code)
+            elif code == CLEAR_CODE:
+                history = bytearray()
+                mark = 0
+                next_code = FIRST_CODE
+                previous_length = 0
+            elif code < limit:
+                offset = offsets[code]
+                output += history[offset:offset + lengths[code]]
+            else:
+                raise ValueError(f"Invalid LZW code: {code}")
+
+        output += history[mark:]
+        self.history = history
+        self.next_code = next_code
+        self.previous_offset = previous_offset
+        self.previous_length = previous_length
+        return output
+
+    def feed(self, chunk):
+        """Add compressed bytes; returns the data of every packet now complete"""
+        if self.eof:
+            raise ValueError("Data after the end of the LZW stream")
+        self.buffer += chunk
+        if self.max_bits is None:
+            if len(self.buffer) < len(MAGIC) + 1:
+                return b''
+            if self.buffer[:len(MAGIC)] != MAGIC:
+                raise ValueError("Not an LZW compressed file")
+            self.__start(self.buffer[len(MAGIC)])
+            del self.buffer[:len(MAGIC) + 1]
+
+        output = bytearray()
+        consumed = 0
+        while len(self.buffer) - consumed >= 8:
+            count = int.from_bytes(self.buffer[consumed:consumed + 8], byteorder='big')
+            if count == 0:
+                consumed += 8
+                self.eof = True
+                if len(self.buffer) > consumed:
+                    raise ValueError("Data after the end of the LZW stream")
+                break
+            # The encoder never writes longer packets; a larger count would
+            # make the widths below allocate whatever the header says
+            if count > PACKET_CODES:
+                raise ValueError("Invalid LZW packet")
+            size = packed_size(count, self.max_bits, self.position)
+            if len(self.buffer) - consumed - 8 < size:
+                break
+            codes = unpack_codes(self.buffer[consumed + 8:consumed + 8 + size], count, self.max_bits, self.position)
+            consumed += 8 + size
+            self.position = 0 if codes[-1] == CLEAR_CODE else self.position + count
+            output += self.decode(codes)
+        del self.buffer[:consumed]
+        return bytes(output)
+
+    def flush(self):
+        """Check that the stream ended; returns any remaining output"""
+        if not self.eof:
+            raise ValueError("Truncated LZW code stream")
+        return b''
+
+class LZWCodec:
+    """
+    LZW compressor and decompressor.
+
+    All dictionary state lives in the encoder or decoder made for each call
+    and the instance only holds its settings, so one codec can serve many
+    jobs at once from threads, or be pickled to worker processes.
+    """
+
+    def __init__(self, max_bits=MAX_BITS, reset=True):
+        check_max_bits(max_bits)
+        self.max_bits = max_bits
+        # False keeps a full dictionary for the rest of the input
+        self.reset = reset
+
+    def encode(self, input_data):
+        """Returns the list of LZW codes for ``input_data``"""
+        encoder = LZWEncoder(self.max_bits, self.reset)
+        return encoder.encode(input_data) + encoder.finish()
+
+    def decode(self, input_data):
+        """Returns the bytes encoded by a list of LZW codes"""
+        return LZWDecoder(self.max_bits).decode(input_data)
+
+    def compress(self, data):
+        """Compress a bytes-like object; returns the compressed file contents"""
+        encoder = LZWEncoder(self.max_bits, self.reset)
+        return encoder.feed(data) + encoder.flush()
+
+    def decompress(self, data):
+        """
+        Decompress the contents of a compressed file.
+
+        The code width stored in the data is used, so data written with any
+        max_bits can be read by any codec.
+        """
+        decoder = LZWDecoder()
+        output = decoder.feed(data)
+        return output + decoder.flush()
+
+    def compress_stream(self, input_file, output_file, progress_callback=None):
+        """
+        Compress between binary file objects in CHUNK_SIZE steps, so memory
+        does not grow with the input.
+
+        Args:
+            progress_callback (callable): Called with the number of input
+                bytes processed so far after every step.
+        """
+        self.__compress_chunks(iter(lambda: input_file.read(CHUNK_SIZE), b''), output_file, progress_callback)
+
+    def __compress_chunks(self, chunks, output_file, progress_callback):
+        encoder = LZWEncoder(self.max_bits, self.reset)
+        processed = 0
+        for chunk in chunks:
+            output_file.write(encoder.feed(chunk))
+            processed += len(chunk)
+            if progress_callback:
+                progress_callback(processed)
+        output_file.write(encoder.flush())
+
+    def decompress_stream(self, input_file, output_file, progress_callback=None):
+        """Decompress between binary file objects; progress counts compressed bytes read"""
+        decoder = LZWDecoder()
+        processed = 0
+        chunk = input_file.read(CHUNK_SIZE)
+        while chunk:
+            output_file.write(decoder.feed(chunk))
+            processed += len(chunk)
+            if progress_callback:
+                progress_callback(processed)
+            chunk = input_file.read(CHUNK_SIZE)
+        output_file.write(decoder.flush())
+
+    def compress_file(self, input_path, output_path, progress_callback=None):
+        # The encoder takes slices of the memory-mapped input, so the file
+        # is not copied into memory
+        with MappedInput(input_path) as source, open(output_path, 'wb') as output:
+            self.__compress_chunks(source.chunks(CHUNK_SIZE), output, progress_callback)
+
+    def decompress_file(self, input_path, output_path, progress_callback=None):
+        with open(input_path, 'rb') as file, open(output_path, 'wb') as output:
+            self.decompress_stream(file, output, progress_callback)
+
+def compress_file(input_path, output_path, progress_callback=None, max_bits=MAX_BITS):
+    LZWCodec(max_bits).compress_file(input_path, output_path, progress_callback)
+
+def decompress_file(input_path, output_path, progress_callback=None):
+    LZWCodec().decompress_file(input_path, output_path, progress_callback)
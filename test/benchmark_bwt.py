@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Burrows-Wheeler Benchmark
+
+This script compresses a file with bzip2, optionally with parallel
+multi-stream bzip2, and with the in-project Burrows-Wheeler pipeline at
+several block sizes and suffix sorting strategies, and reports the size and
+speed of each against bzip2.
+"""
+
+import os
+import time
+import hashlib
+import argparse
+from tabulate import tabulate
+
+from burrowswheeler.burrowswheeler import compress, decompress, compress_native, decompress_native, SORT_STRATEGIES
+
+def get_file_hash(filename):
+    """Calculate MD5 hash of a file to verify integrity"""
+    hash_md5 = hashlib.md5()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+def benchmark(input_file, name, compress_function, decompress_function):
+    """Compress and decompress a file with one configuration"""
+    file_size = os.path.getsize(input_file)
+    compressed_file = input_file + ".bwt_benchmark"
+    decompressed_file = input_file + ".bwt_benchmark.out"
+
+    start_time = time.time()
+    compress_function(input_file, compressed_file)
+    compression_time = time.time() - start_time
+    compressed_size = os.path.getsize(compressed_file)
+
+    start_time = time.time()
+    decompress_function(compressed_file, decompressed_file)
+    decompression_time = time.time() - start_time
+
+    integrity_check = "PASS" if get_file_hash(input_file) == get_file_hash(decompressed_file) else "FAIL"
+    os.remove(compressed_file)
+    os.remove(decompressed_file)
+
+    return {
+        "name": name,
+        "compressed_size": compressed_size,
+        "compression_ratio": (1 - (compressed_size / file_size)) * 100 if file_size else 0,
+        "compression_time": compression_time,
+        "decompression_time": decompression_time,
+        "integrity": integrity_check
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the native Burrows-Wheeler pipeline against bzip2')
+    parser.add_argument('file', help='File to compress')
+    parser.add_argument('--block-sizes', nargs='*', type=int, default=[100000, 900000], help='Block sizes to test; none skips the native pipeline')
+    parser.add_argument('--strategies', nargs='+', choices=SORT_STRATEGIES, default=["doubling"], help='Suffix sorting strategies to test')
+    parser.add_argument('--workers', nargs='+', type=int, default=[], help='Worker counts to test parallel bzip2 with')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Error: File {args.file} does not exist")
+        return
+
+    baseline = benchmark(args.file, "bzip2", compress, decompress)
+    results = [baseline]
+    for workers in args.workers:
+        results.append(benchmark(
+            args.file, f"bzip2 {workers} workers",
+            lambda input_file, output_file: compress(input_file, output_file, workers=workers),
+            lambda input_file, output_file: decompress(input_file, output_file, workers=workers)))
+    for strategy in args.strategies:
+        for block_size in args.block_sizes:
+            results.append(benchmark(
+                args.file, f"native {strategy} {block_size}",
+                lambda input_file, output_file: compress_native(input_file, output_file, block_size, strategy),
+                decompress_native))
+
+    headers = ["Configuration", "Compressed Size (B)", "Compression Ratio (%)", "Size vs bzip2 (%)",
+               "Compression Time (s)", "Decompression Time (s)", "Integrity"]
+
+    table_data = []
+    for result in results:
+        size_cost = (result["compressed_size"] / baseline["compressed_size"] - 1) * 100 if baseline["compressed_size"] else 0
+        table_data.append([
+            result["name"],
+            result["compressed_size"],
+            f"{result['compression_ratio']:.2f}",
+            f"{size_cost:+.2f}",
+            f"{result['compression_time']:.4f}",
+            f"{result['decompression_time']:.4f}",
+            result["integrity"]
+        ])
+
+    print(tabulate(table_data, headers=headers, tablefmt="grid"))
+
+if __name__ == "__main__":
+    main()
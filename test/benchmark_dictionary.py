@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Deflate Preset Dictionary Benchmark
+
+This script trains a preset dictionary on part of a directory of small,
+similar files and compresses the rest with and without it, reporting the
+total size and time of each at several compression levels.
+"""
+
+import os
+import time
+import zlib
+import argparse
+from tabulate import tabulate
+
+from deflate.deflate import train_dictionary, DictionaryCodec
+
+def benchmark_level(datas, dictionary, level):
+    """Compress every file with and without the dictionary at one level"""
+    start_time = time.time()
+    plain_size = sum(len(zlib.compress(data, level)) for data in datas)
+    plain_time = time.time() - start_time
+
+    codec = DictionaryCodec(dictionary, level)
+    start_time = time.time()
+    compressed = [codec.compress(data) for data in datas]
+    dictionary_time = time.time() - start_time
+
+    integrity_check = "PASS" if all(codec.decompress(c) == data for c, data in zip(compressed, datas)) else "FAIL"
+
+    return {
+        "level": level,
+        "plain_size": plain_size,
+        "plain_time": plain_time,
+        "dictionary_size": sum(len(c) for c in compressed),
+        "dictionary_time": dictionary_time,
+        "integrity": integrity_check
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark deflate preset dictionaries on small files')
+    parser.add_argument('directory', help='Directory of small, similar files')
+    parser.add_argument('--train-fraction', type=float, default=0.2, help='Fraction of the files to train on')
+    parser.add_argument('--levels', nargs='+', type=int, default=[1, 6, 9], help='Compression levels to test')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory {args.directory} does not exist")
+        return
+
+    files = sorted(os.path.join(args.directory, name) for name in os.listdir(args.directory)
+                   if os.path.isfile(os.path.join(args.directory, name)))
+    split = max(1, int(len(files) * args.train_fraction))
+    if split >= len(files):
+        print("Error: Need more files than are used for training")
+        return
+
+    start_time = time.time()
+    dictionary = train_dictionary(files[:split])
+    print(f"Trained a {len(dictionary)} byte dictionary on {split} files in {time.time() - start_time:.2f} s")
+
+    datas = []
+    for path in files[split:]:
+        with open(path, 'rb') as f:
+            datas.append(f.read())
+    total_size = sum(len(data) for data in datas)
+
+    headers = ["Level", "Plain Size (B)", "Plain Ratio (%)", "Plain Time (s)",
+               "Dictionary Size (B)", "Dictionary Ratio (%)", "Dictionary Time (s)", "Integrity"]
+
+    table_data = []
+    for level in args.levels:
+        result = benchmark_level(datas, dictionary, level)
+        table_data.append([
+            result["level"],
+            result["plain_size"],
+            f"{(1 - result['plain_size'] / total_size) * 100:.2f}" if total_size else "0.00",
+            f"{result['plain_time']:.4f}",
+            result["dictionary_size"],
+            f"{(1 - result['dictionary_size'] / total_size) * 100:.2f}" if total_size else "0.00",
+            f"{result['dictionary_time']:.4f}",
+            result["integrity"]
+        ])
+
+    print(f"Compressed {len(datas)} files, {total_size} bytes")
+    print(tabulate(table_data, headers=headers, tablefmt="grid"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Huffman Code Length Benchmark
+
+This script compresses a file with Huffman coding at several maximum code
+lengths and reports the compression ratio cost of each limit next to the
+decompression speedup, both relative to unlimited code lengths.
+"""
+
+import os
+import time
+import hashlib
+import argparse
+import tempfile
+from tabulate import tabulate
+
+from huffman.huffman import HuffmanCoding
+
+def get_file_hash(filename):
+    """Calculate MD5 hash of a file to verify integrity"""
+    hash_md5 = hashlib.md5()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+def benchmark_limit(input_file, max_code_length, repeat):
+    """Compress and decompress a file with one code length limit"""
+    file_size = os.path.getsize(input_file)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        compressed_file = os.path.join(output_dir, "compressed.bin")
+        decompressed_file = os.path.join(output_dir, "decompressed")
+
+        huffman_coder = HuffmanCoding(input_file, max_code_length=max_code_length)
+        start_time = time.time()
+        huffman_coder.compress(compressed_file)
+        compression_time = time.time() - start_time
+        compressed_size = os.path.getsize(compressed_file)
+
+        # Keep the best of several runs; decoding is the path being tuned
+        decompression_time = None
+        for _ in range(repeat):
+            start_time = time.time()
+            HuffmanCoding(compressed_file).decompress(compressed_file, decompressed_file)
+            elapsed = time.time() - start_time
+            if decompression_time is None or elapsed < decompression_time:
+                decompression_time = elapsed
+
+        integrity_check = "PASS" if get_file_hash(input_file) == get_file_hash(decompressed_file) else "FAIL"
+
+    return {
+        "max_code_length": max_code_length,
+        "longest_code": huffman_coder.longest_code,
+        "compressed_size": compressed_size,
+        "compression_ratio": (1 - (compressed_size / file_size)) * 100 if file_size else 0,
+        "compression_time": compression_time,
+        "decompression_time": decompression_time,
+        "integrity": integrity_check
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark length-limited Huffman codes')
+    parser.add_argument('file', help='File to compress')
+    parser.add_argument('--limits', nargs='+', type=int, default=[15, 12, 10], help='Maximum code lengths to test')
+    parser.add_argument('--repeat', type=int, default=3, help='Decompression runs per limit')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Error: File {args.file} does not exist")
+        return
+
+    baseline = benchmark_limit(args.file, None, args.repeat)
+    results = [baseline] + [benchmark_limit(args.file, limit, args.repeat) for limit in args.limits]
+
+    headers = ["Max Code Length", "Longest Code", "Compressed Size (B)", "Compression Ratio (%)",
+               "Size Cost (%)", "Decompression Time (s)", "Decode Speedup", "Integrity"]
+
+    table_data = []
+    for result in results:
+        size_cost = (result["compressed_size"] / baseline["compressed_size"] - 1) * 100 if baseline["compressed_size"] else 0
+        speedup = baseline["decompression_time"] / result["decompression_time"] if result["decompression_time"] else 0
+        table_data.append([
+            result["max_code_length"] or "unlimited",
+            result["longest_code"],
+            result["compressed_size"],
+            f"{result['compression_ratio']:.2f}",
+            f"{size_cost:+.3f}",
+            f"{result['decompression_time']:.4f}",
+            f"{speedup:.2f}x",
+            result["integrity"]
+        ])
+
+    print(tabulate(table_data, headers=headers, tablefmt="grid"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Codec API Test Script
+
+This script round-trips data through the codec modules directly, covering
+features the compression handler does not expose, and reports PASS or
+FAIL for every check.
+"""
+
+import io
+import os
+import bz2
+import gzip
+import json
+import random
+import shutil
+import argparse
+import numpy as np
+from tabulate import tabulate
+
+from deflate.deflate import compress_file as deflate_compress, decompress_file as deflate_decompress
+from deflate.deflate import read_range as deflate_read_range, train_dictionary, save_dictionary
+from burrowswheeler.burrowswheeler import compress as bw_compress, decompress as bw_decompress
+from burrowswheeler.burrowswheeler import read_range as bw_read_range, compress_native, decompress_native
+from burrowswheeler.burrowswheeler import SORT_STRATEGIES, mtf_encode, mtf_decode, rle_zero_encode, rle_zero_decode
+from huffman.huffman import HuffmanCoding, AdaptiveHuffmanDecoder, compress_adaptive, decompress_adaptive
+from lzw.lzw import LZWEncoder, LZWDecoder
+
+def create_test_data(size, seed=0):
+    """Create log-like text with a stretch of random bytes in the middle"""
+    rng = random.Random(seed)
+    levels = ["INFO", "DEBUG", "WARNING", "ERROR"]
+    lines = []
+    length = 0
+    while length < size:
+        line = (f"2024-01-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d} "
+                f"{rng.choice(levels)} worker-{rng.randint(1, 8)} request {rng.randint(0, 99999)} "
+                f"took {rng.random() * 100:.3f} ms\n")
+        lines.append(line)
+        length += len(line)
+    text = "".join(lines).encode()[:size]
+    middle = size // 2
+    noise = bytes(rng.getrandbits(8) for _ in range(min(size // 8, 1 << 16)))
+    return text[:middle] + noise + text[middle + len(noise):]
+
+def write_test_file(work_dir, name, data):
+    """Write data to a file in the work directory and return its path"""
+    path = os.path.join(work_dir, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+def read_file(path):
+    """Return the contents of a file"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+def random_splits(data, rng, largest=5000):
+    """Cut data into pieces of random size, including empty ones"""
+    pieces = []
+    position = 0
+    while position < len(data):
+        size = rng.randint(0, largest)
+        pieces.append(data[position:position + size])
+        position += size
+    return pieces
+
+def check_ranges(read_range, archive, data, rng, count=20):
+    """Compare read_range at random offsets, and at the edges, with slices of data"""
+    ranges = [(0, 0), (0, len(data)), (len(data) - 1, 10), (len(data), 5), (len(data) + 10, 5)]
+    ranges += [(rng.randrange(len(data)), rng.randint(1, 1 << 21)) for _ in range(count)]
+    return all(read_range(archive, offset, length) == data[offset:offset + length] for offset, length in ranges)
+
+def check_huffman_limits(work_dir):
+    """Limit the code length on a skewed input and check the longest code"""
+    rng = random.Random(7)
+    # Fibonacci counts give the deepest Huffman tree for their total
+    counts = [1, 1]
+    while len(counts) < 22:
+        counts.append(counts[-1] + counts[-2])
+    symbols = bytearray()
+    for char, count in enumerate(counts):
+        symbols += bytes([char]) * count
+    rng.shuffle(symbols)
+    data = bytes(symbols)
+    huffman_coder = HuffmanCoding(None)
+    # Without a limit the input needs codes longer than 15 bits
+    passed = huffman_coder.decompress_bytes(huffman_coder.compress_bytes(data)) == data
+    passed = passed and huffman_coder.longest_code > 15
+    for context_order in (0, 1):
+        for max_code_length in (15, 12, 9):
+            huffman_coder = HuffmanCoding(None, max_code_length=max_code_length, context_order=context_order)
+            compressed = huffman_coder.compress_bytes(data)
+            passed = passed and HuffmanCoding(None).decompress_bytes(compressed) == data
+            passed = passed and 0 < huffman_coder.longest_code <= max_code_length
+    return passed
+
+def check_huffman_workers(work_dir):
+    """Compress and decompress several Huffman blocks in a process pool"""
+    data = create_test_data(1 << 20)
+    input_file = write_test_file(work_dir, "workers.log", data)
+    compressed_file = os.path.join(work_dir, "workers.huf")
+    passed = True
+    for context_order in (0, 1):
+        huffman_coder = HuffmanCoding(input_file, block_size=1 << 18, workers=2, context_order=context_order)
+        with open(compressed_file, 'wb') as output:
+            huffman_coder.compress_to(output)
+        output = io.BytesIO()
+        with open(compressed_file, 'rb') as f:
+            HuffmanCoding(compressed_file, workers=2).decompress_stream(f, output)
+        passed = passed and output.getvalue() == data
+        # The archive must not depend on the number of workers
+        passed = passed and HuffmanCoding(None).decompress_bytes(read_file(compressed_file)) == data
+    return passed
+
+def check_adaptive_huffman(work_dir):
+    """Code an adaptive Huffman stream and decode it from random splits"""
+    rng = random.Random(4)
+    data = create_test_data(1 << 18)
+    compressed = io.BytesIO()
+    compress_adaptive(io.BytesIO(data), compressed, segment_size=4096)
+    decoder = AdaptiveHuffmanDecoder()
+    decoded = b"".join(decoder.feed(piece) for piece in random_splits(compressed.getvalue(), rng)) + decoder.flush()
+    output = io.BytesIO()
+    decompress_adaptive(io.BytesIO(compressed.getvalue()), output)
+    # Adaptive streams are also read by HuffmanCoding
+    passed = decoded == data and output.getvalue() == data
+    return passed and HuffmanCoding(None).decompress_bytes(compressed.getvalue()) == data
+
+def check_lzw_split_feed(work_dir):
+    """Feed LZW input and compressed data in random splits"""
+    rng = random.Random(5)
+    data = create_test_data(1 << 17)
+    encoder = LZWEncoder(max_bits=12)
+    whole = encoder.feed(data) + encoder.flush()
+    encoder = LZWEncoder(max_bits=12)
+    split = b"".join(encoder.feed(piece) for piece in random_splits(data, rng)) + encoder.flush()
+    decoder = LZWDecoder()
+    decoded = b"".join(decoder.feed(piece) for piece in random_splits(split, rng)) + decoder.flush()
+    # The output must not depend on how the input was split
+    return split == whole and decoded == data
+
+def check_bw_native(work_dir):
+    """Round-trip the native Burrows-Wheeler pipeline and its stages on edge cases"""
+    rng = random.Random(6)
+    inputs = [
+        b"",
+        b"a",
+        b"\x00" * 5000,
+        b"\xff" * 5000,
+        # Cycling through every byte value gives move-to-front ranks that
+        # need the escape symbol
+        bytes(range(256)) * 8,
+        create_test_data(1 << 14),
+    ]
+    passed = True
+    for data in inputs:
+        array = np.frombuffer(data, dtype=np.uint8)
+        passed = passed and mtf_decode(mtf_encode(array)).tobytes() == data
+    # Zero runs of every length up to a few digits, between escaped values
+    for length in range(1, 70):
+        values = np.array([0] * length + [255, 254, 253, 1] + [0] * rng.randint(0, 9), dtype=np.uint8)
+        passed = passed and np.array_equal(rle_zero_decode(rle_zero_encode(values)), values)
+
+    compressed_file = os.path.join(work_dir, "native.bwt")
+    decompressed_file = os.path.join(work_dir, "native.out")
+    for i, data in enumerate(inputs):
+        input_file = write_test_file(work_dir, f"native{i}.bin", data)
+        for strategy in SORT_STRATEGIES:
+            # One-byte blocks only on short inputs; every block is sorted alone
+            for block_size in ((1, 1000, 1 << 20) if len(data) <= 5000 else (1000, 1 << 20)):
+                compress_native(input_file, compressed_file, block_size=block_size, sort_strategy=strategy)
+                decompress_native(compressed_file, decompressed_file)
+                passed = passed and read_file(decompressed_file) == data
+    return passed
+
+def check_bw_workers(work_dir):
+    """Compress and decompress bzip2 streams in a process pool"""
+    data = create_test_data(1 << 20)
+    input_file = write_test_file(work_dir, "workers.log", data)
+    compressed_file = os.path.join(work_dir, "workers.bz2")
+    decompressed_file = os.path.join(work_dir, "workers.out")
+    bw_compress(input_file, compressed_file, compresslevel=1, workers=2)
+    bw_decompress(compressed_file, decompressed_file, workers=2)
+    return read_file(decompressed_file) == data and bz2.decompress(read_file(compressed_file)) == data
+
+def check_bw_range(work_dir):
+    """Read random ranges of an indexed bzip2 archive"""
+    data = create_test_data(1 << 20)
+    input_file = write_test_file(work_dir, "range.log", data)
+    compressed_file = os.path.join(work_dir, "range.log.bz2")
+    bw_compress(input_file, compressed_file, compresslevel=1, index=True)
+    return (check_ranges(bw_read_range, compressed_file, data, random.Random(2))
+            and bz2.decompress(read_file(compressed_file)) == data)
+
+def check_deflate_workers(work_dir):
+    """Compress deflate blocks in a thread pool into one zlib stream"""
+    data = create_test_data(1 << 20)
+    input_file = write_test_file(work_dir, "workers.log", data)
+    compressed_file = os.path.join(work_dir, "workers.z")
+    decompressed_file = os.path.join(work_dir, "workers.out")
+    deflate_compress(input_file, compressed_file, workers=2)
+    deflate_decompress(compressed_file, decompressed_file)
+    return read_file(decompressed_file) == data
+
+def check_gzip_output(work_dir):
+    """Write gzip output sequentially and in parallel; read it with the gzip module"""
+    data = create_test_data(1 << 19)
+    input_file = write_test_file(work_dir, "output.log", data)
+    compressed_file = os.path.join(work_dir, "output.gz")
+    decompressed_file = os.path.join(work_dir, "output.out")
+    passed = True
+    for workers in (None, 2):
+        deflate_compress(input_file, compressed_file, wrapper="gzip", workers=workers)
+        deflate_decompress(compressed_file, decompressed_file)
+        passed = passed and gzip.decompress(read_file(compressed_file)) == data
+        passed = passed and read_file(decompressed_file) == data
+    return passed
+
+def check_gzip_members(work_dir):
+    """Decompress a gzip file made of several concatenated members"""
+    compressed_file = os.path.join(work_dir, "members.gz")
+    decompressed_file = os.path.join(work_dir, "members.out")
+    with open(compressed_file, 'wb') as f:
+        f.write(gzip.compress(b'hello ') + gzip.compress(b'') + gzip.compress(b'world'))
+    passed = True
+    # One byte per step splits every member header across reads
+    for buffer_size in (1, 1 << 20):
+        deflate_decompress(compressed_file, decompressed_file, buffer_size=buffer_size)
+        passed = passed and read_file(decompressed_file) == b'hello world'
+    return passed
+
+def check_dictionary(work_dir):
+    """Train a dictionary on small files and decompress with dictionary_dir"""
+    rng = random.Random(3)
+    sample_files = []
+    for i in range(40):
+        record = {"id": i, "user": f"user{rng.randint(1, 500)}", "status": rng.choice(["active", "disabled"]),
+                  "roles": rng.sample(["admin", "editor", "viewer", "auditor"], 2), "score": rng.random()}
+        sample_files.append(write_test_file(work_dir, f"record{i}.json", json.dumps(record, indent=2).encode()))
+    dictionary = train_dictionary(sample_files[:10])
+    dictionary_dir = os.path.join(work_dir, "dictionaries")
+    save_dictionary(dictionary, dictionary_dir)
+    compressed_file = os.path.join(work_dir, "record.z")
+    decompressed_file = os.path.join(work_dir, "record.out")
+    passed = bool(dictionary)
+    for input_file in sample_files[10:]:
+        deflate_compress(input_file, compressed_file, dictionary=dictionary)
+        deflate_decompress(compressed_file, decompressed_file, dictionary_dir=dictionary_dir)
+        passed = passed and read_file(decompressed_file) == read_file(input_file)
+    # Without the dictionary the stream cannot be read
+    try:
+        deflate_decompress(compressed_file, decompressed_file)
+        passed = False
+    except ValueError:
+        pass
+    return passed
+
+def check_deflate_range(work_dir):
+    """Read random ranges of an indexed deflate archive"""
+    data = create_test_data(3 << 20)
+    input_file = write_test_file(work_dir, "range.log", data)
+    compressed_file = os.path.join(work_dir, "range.log.z")
+    deflate_compress(input_file, compressed_file, index=True)
+    return check_ranges(deflate_read_range, compressed_file, data, random.Random(1))
+
+CHECKS = [
+    ("huffman", "length limits", check_huffman_limits),
+    ("huffman", "workers", check_huffman_workers),
+    ("huffman", "adaptive stream", check_adaptive_huffman),
+    ("lzw", "split feeds", check_lzw_split_feed),
+    ("burrowswheeler", "native pipeline", check_bw_native),
+    ("burrowswheeler", "workers", check_bw_workers),
+    ("burrowswheeler", "range reads", check_bw_range),
+    ("deflate", "workers", check_deflate_workers),
+    ("deflate", "gzip output", check_gzip_output),
+    ("deflate", "gzip members", check_gzip_members),
+    ("deflate", "preset dictionary", check_dictionary),
+    ("deflate", "range reads", check_deflate_range),
+]
+
+def run_checks(work_dir):
+    """Run every check and collect its result"""
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    for codec, name, check in CHECKS:
+        try:
+            result = "PASS" if check(work_dir) else "FAIL"
+        except Exception as e:
+            print(f"Error checking {codec} {name}: {str(e)}")
+            result = "ERROR"
+        results.append([codec, name, result])
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Round-trip checks of the codec APIs')
+    parser.add_argument('--work-dir', default='codec_test_files', help='Directory to store temporary files')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary files')
+
+    args = parser.parse_args()
+
+    results = run_checks(args.work_dir)
+    print(tabulate(results, headers=["Codec", "Check", "Result"], tablefmt="grid"))
+
+    if not args.keep:
+        shutil.rmtree(args.work_dir, ignore_errors=True)
+
+    failed = sum(1 for result in results if result[2] != "PASS")
+    print(f"\n{len(results) - failed} of {len(results)} checks passed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
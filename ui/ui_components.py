@@ -11,6 +11,8 @@ from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
 
+from compression.mapped_input import MappedInput
+
 # Import compression modules - these will be used by the compression handler
 from deflate.deflate import compress_file as deflate_compress, decompress_file as deflate_decompress
 from huffman.huffman import HuffmanCoding
@@ -38,10 +40,6 @@ class EncryptionHandler:
     @staticmethod
     def encrypt_file(input_file, output_file, password):
         """Encrypt a file using AES-256"""
-        # Read the input file
-        with open(input_file, 'rb') as f:
-            data = f.read()
-        
         # Derive a key from the password
         key, salt = EncryptionHandler.derive_key(password)
         
@@ -51,46 +49,36 @@ class EncryptionHandler:
         # Create an encryptor
         cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
         encryptor = cipher.encryptor()
-        
-        # Pad the data
         padder = padding.PKCS7(128).padder()
-        padded_data = padder.update(data) + padder.finalize()
-        
-        # Encrypt the data
-        encrypted_data = encryptor.update(padded_data) + encryptor.finalize()
         
-        # Write the salt, IV, and encrypted data to the output file
-        with open(output_file, 'wb') as f:
+        # Write the salt and IV, then pad and encrypt the memory-mapped
+        # input chunk by chunk
+        with MappedInput(input_file) as source, open(output_file, 'wb') as f:
             f.write(salt)
             f.write(iv)
-            f.write(encrypted_data)
+            for chunk in source.chunks():
+                f.write(encryptor.update(padder.update(chunk)))
+            f.write(encryptor.update(padder.finalize()) + encryptor.finalize())
     
     @staticmethod
     def decrypt_file(input_file, output_file, password):
         """Decrypt a file using AES-256"""
-        # Read the input file
-        with open(input_file, 'rb') as f:
-            salt = f.read(16)
-            iv = f.read(16)
-            encrypted_data = f.read()
-        
-        # Derive the key from the password and salt
-        key, _ = EncryptionHandler.derive_key(password, salt)
-        
-        # Create a decryptor
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-        decryptor = cipher.decryptor()
-        
-        # Decrypt the data
-        padded_data = decryptor.update(encrypted_data) + decryptor.finalize()
-        
-        # Unpad the data
-        unpadder = padding.PKCS7(128).unpadder()
-        data = unpadder.update(padded_data) + unpadder.finalize()
-        
-        # Write the decrypted data to the output file
-        with open(output_file, 'wb') as f:
-            f.write(data)
+        with MappedInput(input_file) as source, open(output_file, 'wb') as f:
+            salt = bytes(source.view[:16])
+            iv = bytes(source.view[16:32])
+            
+            # Derive the key from the password and salt
+            key, _ = EncryptionHandler.derive_key(password, salt)
+            
+            # Create a decryptor
+            cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
+            decryptor = cipher.decryptor()
+            unpadder = padding.PKCS7(128).unpadder()
+            
+            # Decrypt and unpad chunk by chunk
+            for chunk in source.chunks(start=32):
+                f.write(unpadder.update(decryptor.update(chunk)))
+            f.write(unpadder.update(decryptor.finalize()) + unpadder.finalize())
 
 class AnimatedButton(QPushButton):
     def __init__(self, text, parent=None):
@@ -480,11 +468,9 @@ class CompressionApp(QWidget):
                 elif algorithm == 'huffman':
                     huffman = HuffmanCoding(input_file)
                     if mode == 'compress':
-                        output_path = huffman.compress()
-                        os.rename(output_path, output_file)
+                        huffman.compress(output_file)
                     else:
-                        huffman.decompress(input_file)
-                        os.rename('decompressed_file.txt', output_file)
+                        huffman.decompress(input_file, output_file)
                 
                 elif algorithm == 'lzw':
                     if mode == 'compress':